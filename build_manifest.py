@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+
+# Content-addressed build manifest shared by read_yamls.py, csv_to_pp.py,
+# yaml_to_pp.py and report.py. Each output is recorded with a key hashed from
+# the tool name, the tool's source (and that of the local modules it imports),
+# its options and the SHA-256 of every input file; a tool whose key still
+# matches (and whose output is untouched) can skip regeneration.
+
+import ast
+import functools
+import hashlib
+import json
+import os
+
+MANIFEST_FILE = '.build_manifest.json'
+
+def load_manifest(manifest_file=MANIFEST_FILE):
+    try:
+        with open(manifest_file, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+    manifest.setdefault('files', {})
+    manifest.setdefault('outputs', {})
+    return manifest
+
+def save_manifest(manifest, manifest_file=MANIFEST_FILE):
+    # Write to a temporary file and rename so readers never see a partial manifest
+    tmp_file = f"{manifest_file}.{os.getpid()}.tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_file, manifest_file)
+
+def file_stamp(path):
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+def file_digest(path, manifest=None):
+    # SHA-256 of the file, or None if it does not exist. Digests are cached in
+    # the manifest by size and mtime so unchanged inputs are not re-read.
+    try:
+        stamp = file_stamp(path)
+    except OSError:
+        return None
+    cache = manifest['files'] if manifest is not None else {}
+    cached = cache.get(path)
+    if cached and cached[:2] == stamp:
+        return cached[2]
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            sha.update(block)
+    digest = sha.hexdigest()
+    cache[path] = stamp + [digest]
+    return digest
+
+def local_imports(source_file):
+    # Modules imported by source_file that live next to it as .py files
+    with open(source_file, 'rb') as f:
+        tree = ast.parse(f.read(), source_file)
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names.add(node.module)
+    directory = os.path.dirname(source_file)
+    return [path for path in (os.path.join(directory, f"{name}.py") for name in sorted(names))
+            if os.path.isfile(path)]
+
+@functools.lru_cache(maxsize=None)
+def source_digest(source_file):
+    # SHA-256 over source_file and, transitively, the local modules it imports,
+    # so any code change to a tool invalidates the outputs it built
+    pending = [os.path.abspath(source_file)]
+    seen = set()
+    while pending:
+        path = pending.pop()
+        if path not in seen:
+            seen.add(path)
+            pending.extend(local_imports(path))
+    sha = hashlib.sha256()
+    for path in sorted(seen):
+        sha.update(os.path.basename(path).encode('utf-8'))
+        with open(path, 'rb') as f:
+            sha.update(hashlib.sha256(f.read()).digest())
+    return sha.hexdigest()
+
+def build_key(tool, source_file, input_files, options, manifest=None):
+    # source_file is the tool's own file (its __file__)
+    inputs = [[path, file_digest(path, manifest)] for path in input_files]
+    payload = json.dumps({'tool': tool, 'source': source_digest(source_file), 'inputs': inputs, 'options': options},
+                         sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def is_up_to_date(manifest, output_files, key):
+    # True if every output was last built with this key and has not changed since
+    for output_file in output_files:
+        entry = manifest['outputs'].get(output_file)
+        if not entry or entry['key'] != key:
+            return False
+        try:
+            if file_stamp(output_file) != entry['stamp']:
+                return False
+        except OSError:
+            return False
+    return True
+
+def record_outputs(manifest, output_files, key, manifest_file=MANIFEST_FILE):
+    # Merge into the manifest as it is on disk now, so tools run side by side
+    # (e.g. one read_yamls.py per TGP) do not drop each other's entries
+    current = load_manifest(manifest_file)
+    current['files'].update(manifest['files'])
+    for output_file in output_files:
+        current['outputs'][output_file] = {'key': key, 'stamp': file_stamp(output_file)}
+    try:
+        save_manifest(current, manifest_file)
+    except OSError as e:
+        print(f"Warning: could not write build manifest '{manifest_file}': {e}")
@@ -2,22 +2,20 @@
 
 import csv
 import argparse
+import io
+import json
+import mmap
+import re
 import sys
 import os
 from datetime import datetime
 
-def csvs_to_html(csv_data_dict):
-    html_content = f"""<!DOCTYPE html>
-<html>
-<head>
-    <title>CSV Table Viewer</title>
-    <style>
-        body {{
-            font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, Helvetica, Arial, sans-serif;
-            margin: 20px;
-            background-color: #f5f5f5;
-        }}
-        .container {{
+import numpy as np
+
+from build_manifest import load_manifest, build_key, is_up_to_date, record_outputs
+from html_render import page_head, asset_paths, PAGE_END
+
+STYLE = """        .container {
             width: 100%;
             max-width: none;
             margin: 0;
@@ -25,89 +23,145 @@ def csvs_to_html(csv_data_dict):
             padding: 0;
             border-radius: 0;
             box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-        }}
-        h1 {{
-            color: #333;
-            border-bottom: 2px solid #eee;
-            padding-bottom: 10px;
-        }}
-        .tabs {{
-            display: flex;
-            border-bottom: 1px solid #ddd;
-            margin-bottom: 20px;
-        }}
-        .tab {{
-            padding: 10px 20px;
-            cursor: pointer;
-            border: 1px solid transparent;
-            border-bottom: none;
-            margin-right: 5px;
-            border-radius: 4px 4px 0 0;
-            background-color: #f8f9fa;
-        }}
-        .tab.active {{
-            background-color: white;
-            border-color: #ddd;
-            border-bottom-color: white;
-            margin-bottom: -1px;
-        }}
-        .tab-content {{
-            display: none;
-        }}
-        .tab-content.active {{
-            display: block;
-        }}
-        .csv-table-wrapper {{
+        }
+        .csv-table-wrapper {
             overflow-x: auto;
             margin-bottom: 20px;
             width: 100%;
-        }}
-        table.csv-table {{
+        }
+        table.csv-table {
             border-collapse: collapse;
             width: 100%;
             min-width: 100%;
             background: #fff;
-        }}
-        table.csv-table th, table.csv-table td {{
+        }
+        table.csv-table th, table.csv-table td {
             border: 1px solid #ddd;
             padding: 8px 12px;
             text-align: left;
             font-size: 15px;
-        }}
-        table.csv-table th {{
+        }
+        table.csv-table th {
             background-color: #f2f2f2;
             color: #333;
             font-weight: bold;
-        }}
-        table.csv-table tr:nth-child(even) {{
+        }
+        table.csv-table tr:nth-child(even) {
+            background-color: #fafafa;
+        }
+        table.csv-table th.sortable {
+            cursor: pointer;
+            user-select: none;
+            white-space: nowrap;
+        }
+        table.csv-table th.sortable[data-sort="asc"]::after {
+            content: ' \\25B2';
+        }
+        table.csv-table th.sortable[data-sort="desc"]::after {
+            content: ' \\25BC';
+        }
+        table.csv-table tr.filter-row th {
             background-color: #fafafa;
-        }}
-        .timestamp {{
+            font-weight: normal;
+            padding: 4px 6px;
+        }
+        table.csv-table tr.filter-row input {
+            width: 100%;
+            min-width: 3em;
+            box-sizing: border-box;
+            font-size: 13px;
+            padding: 2px 4px;
+            border: 1px solid #ddd;
+            border-radius: 3px;
+        }
+        .table-status {
             color: #7f8c8d;
-            font-size: 0.8em;
-            text-align: right;
-            margin-top: 20px;
-        }}
-    </style>
-    <script>
-        function switchTab(tabId) {{
-            document.querySelectorAll('.tab-content').forEach(content => {{
-                content.classList.remove('active');
-            }});
-            document.querySelectorAll('.tab').forEach(tab => {{
-                tab.classList.remove('active');
-            }});
-            var tabBtn = document.getElementById('tab-' + tabId);
-            var tabContent = document.getElementById('tab-' + tabId + '-content');
-            if (tabBtn && tabContent) {{
-                tabBtn.classList.add('active');
-                tabContent.classList.add('active');
-            }}
-        }}
-    </script>
-</head>
-<body>
-    <div class="container">
+            font-size: 0.9em;
+            margin-bottom: 6px;
+        }"""
+
+SCRIPT = """        // Sorting and filtering use the per-column numeric keys embedded by
+        // csv_to_pp.py (pair columns sort by the adjusted count, text columns by
+        // a precomputed rank), so cell text is never reparsed on a click.
+        var tableStates = {};
+        var filterTimers = {};
+
+        function tableState(tableId) {
+            if (!tableStates[tableId]) {
+                var table = document.getElementById(tableId);
+                var data = JSON.parse(document.getElementById(table.dataset.keys).textContent);
+                tableStates[tableId] = {
+                    table: table,
+                    tbody: table.tBodies[0],
+                    rows: Array.from(table.tBodies[0].rows),
+                    keys: data.keys.map(col => Float64Array.from(col, v => v === null ? NaN : v)),
+                    text: {},
+                    sortCol: -1,
+                    sortDir: 1
+                };
+            }
+            return tableStates[tableId];
+        }
+
+        function sortTable(tableId, col) {
+            var st = tableState(tableId);
+            st.sortDir = st.sortCol === col ? -st.sortDir : 1;
+            st.sortCol = col;
+            var key = st.keys[col], dir = st.sortDir;
+            var order = new Uint32Array(st.rows.length);
+            for (var i = 0; i < order.length; i++) order[i] = i;
+            // Missing values always sort last; ties keep file order
+            order.sort((a, b) => {
+                var x = key[a], y = key[b];
+                if (x !== x) return y !== y ? a - b : 1;
+                if (y !== y) return -1;
+                return (x - y) * dir || a - b;
+            });
+            var frag = document.createDocumentFragment();
+            order.forEach(i => frag.appendChild(st.rows[i]));
+            st.tbody.appendChild(frag);
+            st.table.querySelectorAll('th.sortable').forEach(th => {
+                if (Number(th.dataset.col) === col) th.dataset.sort = dir > 0 ? 'asc' : 'desc';
+                else delete th.dataset.sort;
+            });
+        }
+
+        function scheduleFilter(tableId) {
+            clearTimeout(filterTimers[tableId]);
+            filterTimers[tableId] = setTimeout(() => applyFilters(tableId), 150);
+        }
+
+        function applyFilters(tableId) {
+            var st = tableState(tableId);
+            var tests = [];
+            st.table.querySelectorAll('tr.filter-row input').forEach(input => {
+                var value = input.value.trim();
+                if (value === '') return;
+                var col = Number(input.dataset.col);
+                if (input.dataset.bound === 'text') {
+                    if (!st.text[col]) {
+                        st.text[col] = st.rows.map(row => row.cells[col] ? row.cells[col].textContent.toLowerCase() : '');
+                    }
+                    var needle = value.toLowerCase(), text = st.text[col];
+                    tests.push(i => text[i].includes(needle));
+                } else {
+                    var bound = Number(value), key = st.keys[col];
+                    if (isNaN(bound)) return;
+                    if (input.dataset.bound === 'min') tests.push(i => key[i] >= bound);
+                    else tests.push(i => key[i] <= bound);
+                }
+            });
+            var shown = 0;
+            st.rows.forEach((row, i) => {
+                var visible = tests.every(test => test(i));
+                row.style.display = visible ? '' : 'none';
+                if (visible) shown++;
+            });
+            document.getElementById(st.table.dataset.status).textContent = shown + ' of ' + st.rows.length + ' rows';
+        }"""
+
+def csvs_to_html(csv_data_dict, output_file="browse_csvs.html", assets_dir=None):
+    html_content = page_head('CSV Table Viewer', [STYLE], [SCRIPT], output_file, assets_dir) + f"""    <div class="container">
         <h1>CSV Table Viewer</h1>
         <div class="tabs">
 {generate_tabs(csv_data_dict)}
@@ -115,9 +169,7 @@ def csvs_to_html(csv_data_dict):
 {generate_tab_contents(csv_data_dict)}
         <div class="timestamp">Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</div>
     </div>
-</body>
-</html>"""
-    output_file = "browse_csvs.html"
+""" + PAGE_END
     with open(output_file, 'w', encoding='utf-8') as f:
         f.write(html_content)
     return output_file
@@ -135,7 +187,7 @@ def generate_tab_contents(csv_data_dict):
     for i, (filename, rows) in enumerate(csv_data_dict.items()):
         tab_id = os.path.splitext(os.path.basename(filename))[0].replace('.', '_')
         active_class = ' active' if i == 0 else ''
-        table_html = csv_rows_to_table(rows)
+        table_html = csv_rows_to_table(rows, tab_id)
         content = f"""        <div id="tab-{tab_id}-content" class="tab-content{active_class}">
             <div class="csv-table-wrapper">
 {table_html}
@@ -144,19 +196,96 @@ def generate_tab_contents(csv_data_dict):
         contents.append(content)
     return '\n'.join(contents)
 
-def csv_rows_to_table(rows):
+def csv_rows_to_table(rows, tab_id):
     if not rows:
         return '<p><em>No data found in this CSV.</em></p>'
     header = rows[0]
-    table = ['<table class="csv-table">']
-    # Header
-    table.append('<tr>' + ''.join(f'<th>{escape_html(col)}</th>' for col in header) + '</tr>')
+    types, keys = column_sort_keys(rows)
+    table_id = f'table-{tab_id}'
+    table = [f'<div class="table-status" id="status-{tab_id}">{len(rows) - 1} rows</div>',
+             f'<table class="csv-table" id="{table_id}" data-keys="keys-{tab_id}" data-status="status-{tab_id}">',
+             '<thead>']
+    # Header, click to sort
+    table.append('<tr>' + ''.join(
+        f'<th class="sortable" data-col="{c}" title="{types[c]} column, click to sort" onclick="sortTable(\'{table_id}\', {c})">{escape_html(col)}</th>'
+        for c, col in enumerate(header)) + '</tr>')
+    # Filters: a min/max range for numeric columns, a substring match for text
+    filters = []
+    for c, col_type in enumerate(types):
+        if col_type == 'text':
+            inputs = f'<input type="text" placeholder="contains" data-col="{c}" data-bound="text" oninput="scheduleFilter(\'{table_id}\')">'
+        else:
+            inputs = ''.join(
+                f'<input type="number" step="any" placeholder="{bound}" data-col="{c}" data-bound="{bound}" oninput="scheduleFilter(\'{table_id}\')">'
+                for bound in ('min', 'max'))
+        filters.append(f'<th>{inputs}</th>')
+    table.append('<tr class="filter-row">' + ''.join(filters) + '</tr>')
+    table.append('</thead>')
+    table.append('<tbody>')
     # Rows
     for row in rows[1:]:
         table.append('<tr>' + ''.join(f'<td>{escape_html(cell)}</td>' for cell in row) + '</tr>')
+    table.append('</tbody>')
     table.append('</table>')
+    keys_json = json.dumps({'types': types, 'keys': keys}, separators=(',', ':'))
+    table.append(f'<script type="application/json" id="keys-{tab_id}">{keys_json}</script>')
     return '\n'.join(table)
 
+NUMBER_RE = re.compile(r'^-?\d+(?:\.\d+)?$')
+PERCENT_RE = re.compile(r'^(-?\d+(?:\.\d+)?)%$')
+PAIR_RE = re.compile(r'^(-?\d+(?:\.\d+)?),(-?\d+(?:\.\d+)?)$')
+
+def parse_sort_key(cell, col_type):
+    # Numeric sort key for a cell of the given column type, or None if it does not parse
+    cell = cell.strip()
+    if col_type == 'number':
+        return float(cell) if NUMBER_RE.match(cell) else None
+    if col_type == 'percent':
+        match = PERCENT_RE.match(cell)
+        return float(match.group(1)) if match else None
+    if col_type == 'pair':
+        # "original,adjusted" cells sort by the adjusted count; a bare number is
+        # an original count with no adjustment, as in read_yamls.py's T column
+        match = PAIR_RE.match(cell)
+        if match:
+            return float(match.group(2))
+        return 0.0 if NUMBER_RE.match(cell) else None
+    return None
+
+def detect_column_type(values):
+    # values are the non-empty cells of one column
+    if not values:
+        return 'text'
+    if all(NUMBER_RE.match(v) for v in values):
+        return 'number'
+    if all(PERCENT_RE.match(v) for v in values):
+        return 'percent'
+    if any(PAIR_RE.match(v) for v in values) and all(PAIR_RE.match(v) or NUMBER_RE.match(v) for v in values):
+        return 'pair'
+    return 'text'
+
+def column_sort_keys(rows):
+    # Returns (types, keys): a type per column and, per column, one numeric sort
+    # key per data row (None where the cell is missing or does not parse).
+    # Repeated header rows and blank lines, as in the combined TGP sweep CSV,
+    # are ignored for type detection and get None keys.
+    header = rows[0]
+    data_rows = rows[1:]
+    types = []
+    keys = []
+    for c, name in enumerate(header):
+        cells = [row[c].strip() if c < len(row) else '' for row in data_rows]
+        col_type = detect_column_type([v for v in cells if v and v != name])
+        if col_type == 'text':
+            # Case-insensitive rank of each distinct value
+            ranks = {v: r for r, v in enumerate(sorted(set(cells), key=lambda v: (v.lower(), v)))}
+            col_keys = [ranks[v] if v and v != name else None for v in cells]
+        else:
+            col_keys = [parse_sort_key(v, col_type) if v else None for v in cells]
+        types.append(col_type)
+        keys.append(col_keys)
+    return types, keys
+
 def escape_html(text):
     # First escape HTML special characters (except ×)
     escaped = (str(text)
@@ -168,14 +297,93 @@ def escape_html(text):
     # Now replace the times symbol with the HTML entity
     return escaped.replace('×', '&times;')
 
-def read_csv_files(csv_files):
+# Sidecar row-offset index written next to each CSV: int64 values
+# [ROW_INDEX_MAGIC, csv size, csv mtime_ns, offset_0, ..., offset_n], where
+# row i spans bytes offset_i..offset_(i+1) and offset_n is the file size
+ROW_INDEX_SUFFIX = '.rowidx'
+ROW_INDEX_MAGIC = 0x31584449574f52  # b'ROWIDX1'
+ROW_INDEX_HEADER = 3
+ROW_INDEX_CHUNK = 16 * 1024 * 1024
+
+def build_row_offsets(buf):
+    # One pass over the mapped file in chunks. Only the positions of quotes and
+    # newlines are materialized; a newline ends a row when an even number of
+    # quotes precede it, so newlines inside quoted fields are skipped (an escaped
+    # "" flips the parity twice and is neutral).
+    size = len(buf)
+    view = memoryview(buf)
+    starts = [np.zeros(1, dtype=np.int64)]
+    quote_parity = 0
+    for pos in range(0, size, ROW_INDEX_CHUNK):
+        chunk = np.frombuffer(view[pos:pos + ROW_INDEX_CHUNK], dtype=np.uint8)
+        quotes = np.flatnonzero(chunk == ord('"'))
+        newlines = np.flatnonzero(chunk == ord('\n'))
+        del chunk
+        outside = (np.searchsorted(quotes, newlines) + quote_parity) % 2 == 0
+        starts.append(newlines[outside].astype(np.int64) + pos + 1)
+        quote_parity = (quote_parity + len(quotes)) % 2
+    view.release()
+    offsets = np.concatenate(starts)
+    # The end of the file closes the last row unless it ended with a newline
+    if offsets[-1] != size:
+        offsets = np.append(offsets, np.int64(size))
+    return offsets
+
+def load_row_offsets(csv_file, buf):
+    # Reuse the sidecar index when it matches the CSV's size and mtime, otherwise
+    # build it and try to save it for the next open
+    stat = os.stat(csv_file)
+    index_file = csv_file + ROW_INDEX_SUFFIX
+    try:
+        index = np.memmap(index_file, dtype=np.int64, mode='r')
+        if (len(index) > ROW_INDEX_HEADER and index[0] == ROW_INDEX_MAGIC
+                and index[1] == stat.st_size and index[2] == stat.st_mtime_ns):
+            return index[ROW_INDEX_HEADER:]
+    except (OSError, ValueError):
+        pass
+    offsets = build_row_offsets(buf)
+    header = np.array([ROW_INDEX_MAGIC, stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+    try:
+        tmp_file = f"{index_file}.{os.getpid()}.tmp"
+        with open(tmp_file, 'wb') as f:
+            header.tofile(f)
+            offsets.tofile(f)
+        os.replace(tmp_file, index_file)
+    except OSError as e:
+        print(f"Warning: could not write row index '{index_file}': {e}")
+    return offsets
+
+def open_indexed_csv(csv_file):
+    # Returns (buf, offsets): the memory-mapped file and its row-offset index.
+    # The number of rows (header included) is len(offsets) - 1.
+    with open(csv_file, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b'', np.zeros(1, dtype=np.int64)
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return buf, load_row_offsets(csv_file, buf)
+
+def read_csv_rows(buf, offsets, start, stop):
+    # Parse only rows start..stop-1; each slice starts and ends on a row boundary
+    start = max(0, min(start, len(offsets) - 1))
+    stop = max(start, min(stop, len(offsets) - 1))
+    text = buf[int(offsets[start]):int(offsets[stop])].decode('utf-8')
+    return list(csv.reader(io.StringIO(text, newline='')))
+
+def read_csv_files(csv_files, start=0, count=None):
+    # Each entry is the header row followed by data rows start..start+count-1
+    # (all data rows when count is None)
     csv_data_dict = {}
     for csv_file in csv_files:
         try:
-            with open(csv_file, 'r', encoding='utf-8') as f:
-                reader = csv.reader(f)
-                rows = list(reader)
-                csv_data_dict[csv_file] = rows
+            buf, offsets = open_indexed_csv(csv_file)
+            try:
+                total = len(offsets) - 1
+                stop = total if count is None else start + 1 + count
+                rows = read_csv_rows(buf, offsets, 0, 1) + read_csv_rows(buf, offsets, start + 1, stop)
+            finally:
+                if isinstance(buf, mmap.mmap):
+                    buf.close()
+            csv_data_dict[csv_file] = rows
         except FileNotFoundError:
             print(f"Error: File '{csv_file}' not found.")
             sys.exit(1)
@@ -187,10 +395,25 @@ def read_csv_files(csv_files):
 def main():
     parser = argparse.ArgumentParser(description='Convert CSV files to a tabbed HTML table viewer')
     parser.add_argument('csv_files', nargs='+', help='Path(s) to the CSV file(s) to convert')
+    parser.add_argument('--start', type=int, default=0, help='First data row to show, counting from 0 (default: 0)')
+    parser.add_argument('--rows', type=int, default=None, help='Number of data rows to show per file (default: all)')
+    parser.add_argument('--assets', metavar='DIR', help='Write the CSS/JS to content-hashed files in DIR and link them instead of inlining them')
+    parser.add_argument('--force', action='store_true', help='Regenerate the HTML even if its inputs and options are unchanged')
     args = parser.parse_args()
 
-    csv_data_dict = read_csv_files(args.csv_files)
-    output_file = csvs_to_html(csv_data_dict)
+    # Skip the run if the page was built from the same CSVs and options
+    output_file = "browse_csvs.html"
+    output_files = [output_file] + (asset_paths([STYLE], [SCRIPT], args.assets) if args.assets else [])
+    manifest = load_manifest()
+    build_id = build_key('csv_to_pp', __file__, args.csv_files,
+                         {'start': args.start, 'rows': args.rows, 'assets': args.assets}, manifest)
+    if not args.force and is_up_to_date(manifest, output_files, build_id):
+        print(f"{output_file} is up to date, skipping (use --force to regenerate)")
+        return
+
+    csv_data_dict = read_csv_files(args.csv_files, args.start, args.rows)
+    output_file = csvs_to_html(csv_data_dict, output_file, args.assets)
+    record_outputs(manifest, output_files, build_id)
     print(f"HTML file generated: {output_file}")
 
 if __name__ == "__main__":
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+
+# Page chrome shared by csv_to_pp.py, yaml_to_pp.py and report.py. Each page is
+# built from the common CSS and tab-switching JS below plus the tool's own
+# STYLE and SCRIPT; a combination is assembled once per process and is either
+# inlined into the page or written once as content-hashed asset files that
+# every page references, so browsers and the report server can cache them.
+
+import functools
+import hashlib
+import os
+
+ASSET_PREFIX = 'st1'
+
+BASE_STYLE = """        body {
+            font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, Helvetica, Arial, sans-serif;
+            margin: 20px;
+            background-color: #f5f5f5;
+        }
+        h1 {
+            color: #333;
+            border-bottom: 2px solid #eee;
+            padding-bottom: 10px;
+        }
+        .tabs {
+            display: flex;
+            flex-wrap: wrap;
+            border-bottom: 1px solid #ddd;
+            margin-bottom: 20px;
+        }
+        .tab {
+            padding: 10px 20px;
+            cursor: pointer;
+            border: 1px solid transparent;
+            border-bottom: none;
+            margin-right: 5px;
+            border-radius: 4px 4px 0 0;
+            background-color: #f8f9fa;
+        }
+        .tab.active {
+            background-color: white;
+            border-color: #ddd;
+            border-bottom-color: white;
+            margin-bottom: -1px;
+        }
+        .tab-content {
+            display: none;
+        }
+        .tab-content.active {
+            display: block;
+        }
+        .timestamp {
+            color: #7f8c8d;
+            font-size: 0.8em;
+            text-align: right;
+            margin-top: 20px;
+        }"""
+
+TAB_SCRIPT = """        function switchTab(tabId) {
+            // Hide all tab contents
+            document.querySelectorAll('.tab-content').forEach(content => {
+                content.classList.remove('active');
+            });
+            // Deactivate all tabs
+            document.querySelectorAll('.tab').forEach(tab => {
+                tab.classList.remove('active');
+            });
+            // Activate selected tab and content
+            var tabBtn = document.getElementById('tab-' + tabId);
+            var tabContent = document.getElementById('tab-' + tabId + '-content');
+            if (tabBtn && tabContent) {
+                tabBtn.classList.add('active');
+                tabContent.classList.add('active');
+            }
+        }"""
+
+PAGE_END = """</body>
+</html>"""
+
+@functools.lru_cache(maxsize=None)
+def compile_assets(styles, scripts):
+    # (css, js) for a tuple of style and script parts, the base chrome first
+    css = '\n'.join((BASE_STYLE,) + styles)
+    js = '\n'.join((TAB_SCRIPT,) + scripts)
+    return css, js
+
+@functools.lru_cache(maxsize=None)
+def asset_name(content, ext):
+    digest = hashlib.sha256(content.encode('utf-8')).hexdigest()[:16]
+    return f"{ASSET_PREFIX}-{digest}.{ext}"
+
+def write_asset(assets_dir, content, ext):
+    # The name is derived from the content, so an existing file is already up to
+    # date and is left untouched
+    path = os.path.join(assets_dir, asset_name(content, ext))
+    if not os.path.exists(path):
+        os.makedirs(assets_dir, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    return path
+
+def asset_paths(styles, scripts, assets_dir):
+    # Paths of the CSS and JS asset files a page with these parts references
+    css, js = compile_assets(tuple(styles), tuple(scripts))
+    return [os.path.join(assets_dir, asset_name(css, 'css')), os.path.join(assets_dir, asset_name(js, 'js'))]
+
+def page_head(title, styles, scripts, output_file, assets_dir=None):
+    # Everything up to and including <body>. Without assets_dir the CSS and JS
+    # are inlined (a single self-contained file); with it they are written to
+    # assets_dir and linked relative to output_file.
+    css, js = compile_assets(tuple(styles), tuple(scripts))
+    if assets_dir:
+        page_dir = os.path.dirname(os.path.abspath(output_file))
+        css_ref = os.path.relpath(write_asset(assets_dir, css, 'css'), page_dir).replace(os.sep, '/')
+        js_ref = os.path.relpath(write_asset(assets_dir, js, 'js'), page_dir).replace(os.sep, '/')
+        assets = f"""    <link rel="stylesheet" href="{css_ref}">
+    <script src="{js_ref}"></script>"""
+    else:
+        assets = f"""    <style>
+{css}
+    </style>
+    <script>
+{js}
+    </script>"""
+    return f"""<!DOCTYPE html>
+<html>
+<head>
+    <title>{title}</title>
+{assets}
+</head>
+<body>
+"""
@@ -1,25 +1,24 @@
 import yaml
 import os
+import numpy as np
 import pandas as pd
 import argparse
+import heapq
 import math
 
-def read_yaml_files(): 
-    yaml_files = ['1.yaml', '2.yaml', '3.yaml', '4.yaml' , '5.yaml']
-    yaml_dicts = {}
-    
-    for file_name in yaml_files:
-        try:
-            with open(file_name, 'r') as file:
-                # Read the file as-is, preserving indentation
-                yaml_dicts[file_name] = yaml.safe_load(file)
-                print(f"Successfully read {file_name}")
-        except yaml.YAMLError as e:
-            print(f"YAML error in {file_name}: {e}")
-        except Exception as e:
-            print(f"Error reading {file_name}: {str(e)}")
-    
-    return yaml_dicts
+import yaml_documents
+from build_manifest import load_manifest, build_key, is_up_to_date, record_outputs, file_digest
+from rfp_store import open_store, file_is_stored, stored_rfp_ids, add_file, add_rfps, stored_tgps, add_summaries
+
+YAML_FILES = ['1.yaml', '2.yaml', '3.yaml', '4.yaml' , '5.yaml']
+
+def iter_yaml_documents(yaml_files=None):
+    # (name, document) for every document of the YAML files (default:
+    # YAML_FILES); see yaml_documents.py
+    return yaml_documents.iter_yaml_documents(yaml_files or YAML_FILES)
+
+def read_yaml_files(yaml_files=None): 
+    return dict(iter_yaml_documents(yaml_files))
 
 def extract_item_fields(data, alpha_percent=None, is_hs=False):
     if isinstance(data, dict):
@@ -61,17 +60,20 @@ def extract_item_fields(data, alpha_percent=None, is_hs=False):
         return [extract_item_fields(item, alpha_percent, is_hs) for item in data]
     return ''
 
-def yaml_dicts_to_dataframe(yaml_dicts):
-    columns = [
-        'rfp_no', 'lead_org', 't1', 't2', 'hn', 'cn', 'hs', 'cs', 'sn', 'sstack', 'total_price'
-    ]
-    rows = []
-    for file_name, data in yaml_dicts.items():
+RFP_COLUMNS = [
+    'rfp_no', 'lead_org', 't1', 't2', 'hn', 'cn', 'hs', 'cs', 'sn', 'sstack', 'total_price'
+]
+SUMMARY_COLUMNS = RFP_COLUMNS + ['alpha', 'B', 'H', 'R', 'L', 'T', 'TGP_Info']
+
+def rfp_rows(documents):
+    # The RFP_COLUMNS of each document; documents is anything document_pairs() takes
+    for _, data in document_pairs(documents):
         rfp = data.get('rfp', {})
-        row = {col: rfp.get(col, None) for col in columns}
-        rows.append(row)
-    df = pd.DataFrame(rows, columns=columns)
-    return df
+        yield {col: rfp.get(col, None) for col in RFP_COLUMNS}
+
+def yaml_dicts_to_dataframe(yaml_dicts):
+    # yaml_dicts is a {name: document} dict or an iterable of (name, document) pairs
+    return pd.DataFrame(list(rfp_rows(yaml_dicts)), columns=RFP_COLUMNS)
 
 def extract_b2_value(t1_data, alpha_percent=None):
     # If it's a list, search for b200_8way in the list
@@ -406,75 +408,655 @@ def extract_l_value(t1_data, t2_data, alpha_percent=None):
         return f"{total},{adjusted_total}" if alpha_percent is not None else total
     return 0
 
-if __name__ == "__main__":
-    # Set up argument parser
-    parser = argparse.ArgumentParser(description='Process YAML files and calculate alpha values.')
-    parser.add_argument('--tgp', type=float, default=1.7, help='Target ST1 price (default: 1.7)')
-    args = parser.parse_args()
+def calculate_t(row):
+    # Sum of the original and of the adjusted B, H, R and L counts
+    def get_values(val):
+        if isinstance(val, str) and ',' in val:
+            return [int(x) for x in val.split(',')]
+        return [int(val), 0]
     
-    # Read all YAML files
-    yaml_data = read_yaml_files()
-    df = yaml_dicts_to_dataframe(yaml_data)
+    b_values = get_values(row['B'])
+    h_values = get_values(row['H'])
+    r_values = get_values(row['R'])
+    l_values = get_values(row['L'])
     
-    # Set display options
-    pd.set_option('display.max_columns', None)
-    pd.set_option('display.max_rows', None)
-    pd.set_option('display.width', 1000)
-    pd.set_option('display.max_colwidth', None)
+    return f"{b_values[0] + h_values[0] + r_values[0] + l_values[0]},{b_values[1] + h_values[1] + r_values[1] + l_values[1]}"
+
+def summarize_rfp(data, tgp):
+    # Summary row for one YAML document, with the same values and columns the
+    # summary CSV has always had
+    rfp = data.get('rfp', {})
+    row = {col: rfp.get(col, None) for col in RFP_COLUMNS}
     
-    # Calculate alpha values first
-    df['alpha'] = (1 / (df['total_price'] / args.tgp)) * 100
-    df['alpha'] = df['alpha'].apply(lambda x: f"{x:.1f}%")
+    # Calculate alpha value first
+    total_price = row['total_price'] if row['total_price'] is not None else float('nan')
+    row['alpha'] = f"{(1 / (total_price / tgp)) * 100:.1f}%"
     
-    # Add a new column 'B' that holds the product of gpu_count and item_count for b200_8way entries
-    df['B'] = df.apply(lambda row: extract_b2_value(row['t1'], row['alpha']), axis=1)
-    # Remove the old 'b2' column if it exists
-    if 'b2' in df.columns:
-        df.drop(columns=['b2'], inplace=True)
+    # 'B' holds the product of gpu_count and item_count for b200_8way entries
+    row['B'] = extract_b2_value(row['t1'], row['alpha'])
     
-    # Add a new column 'H' that holds the product of gpu_count and item_count for h200_8way entries
-    df['H'] = df.apply(lambda row: extract_h_value(row['t1'], row['t2'], row['alpha']), axis=1)
+    # 'H' holds the product of gpu_count and item_count for h200_8way entries
+    row['H'] = extract_h_value(row['t1'], row['t2'], row['alpha'])
     
-    # Extract and format item fields, passing alpha values for t1, t2, and hs
+    # Extract and format item fields
     for col in ['cs', 'cn']:
-        df[col] = df[col].apply(extract_item_fields)
+        row[col] = extract_item_fields(row[col])
     
-    # Special handling for t1, t2, hs, and hn to include adjusted counts
-    df['t1'] = df.apply(lambda row: extract_item_fields(row['t1'], row['alpha']), axis=1)
-    df['t2'] = df.apply(lambda row: extract_item_fields(row['t2'], row['alpha']), axis=1)
-    df['hs'] = df.apply(lambda row: extract_item_fields(row['hs'], row['alpha'], is_hs=True), axis=1)
-    df['hn'] = df.apply(lambda row: extract_item_fields(row['hn'], row['alpha']), axis=1)
-    df['sn'] = df.apply(lambda row: extract_item_fields(row['sn'], row['alpha']), axis=1)
+    # Special handling for t1, t2, hs, hn and sn to include adjusted counts
+    row['t1'] = extract_item_fields(row['t1'], row['alpha'])
+    row['t2'] = extract_item_fields(row['t2'], row['alpha'])
+    row['hs'] = extract_item_fields(row['hs'], row['alpha'], is_hs=True)
+    row['hn'] = extract_item_fields(row['hn'], row['alpha'])
+    row['sn'] = extract_item_fields(row['sn'], row['alpha'])
     
-    # Add a new column 'R' that holds the total product of gpu_count and item_count for rtx6000_ entries
-    df['R'] = df.apply(lambda row: extract_r_value(row['t1'], row['t2'], row['alpha']), axis=1)
+    # 'R' holds the total product of gpu_count and item_count for rtx6000_ entries
+    row['R'] = extract_r_value(row['t1'], row['t2'], row['alpha'])
     
-    # Add a new column 'L' that holds the total product of gpu_count and item_count for l40s_ entries
-    df['L'] = df.apply(lambda row: extract_l_value(row['t1'], row['t2'], row['alpha']), axis=1)
+    # 'L' holds the total product of gpu_count and item_count for l40s_ entries
+    row['L'] = extract_l_value(row['t1'], row['t2'], row['alpha'])
     
-    # Add a new column 'T' that holds the sum of B, H, R, and L values
-    def calculate_t(row):
-        def get_values(val):
-            if isinstance(val, str) and ',' in val:
-                return [int(x) for x in val.split(',')]
-            return [int(val), 0]
-        
-        b_values = get_values(row['B'])
-        h_values = get_values(row['H'])
-        r_values = get_values(row['R'])
-        l_values = get_values(row['L'])
-        
-        return f"{b_values[0] + h_values[0] + r_values[0] + l_values[0]},{b_values[1] + h_values[1] + r_values[1] + l_values[1]}"
-    
-    df['T'] = df.apply(calculate_t, axis=1)
+    # 'T' holds the sum of B, H, R, and L values
+    row['T'] = calculate_t(row)
     
     # Add TGP value information
-    df['TGP_Info'] = f"TGP value is {args.tgp}"
-    
-    print("\nPandas DataFrame (showing item_label and item_count values):")
-    print(df)
+    row['TGP_Info'] = f"TGP value is {tgp}"
+    return row
+
+def document_pairs(documents):
+    # (name, document) pairs from a {name: document} dict, an iterable of pairs
+    # such as iter_yaml_documents(), or RFPs from load_rfps()
+    if isinstance(documents, dict):
+        return documents.items()
+    return ((entry['name'], entry['document']) if isinstance(entry, dict) else entry for entry in documents)
+
+def summarize(documents, tgp=None, tgps=None):
+    # Summary rows as in the summary CSV for one tgp, or for every value of tgps
+    # one TGP after another (told apart by TGP_Info). With a generator and a
+    # single tgp each document is summarized and released before the next one
+    # is parsed.
+    if tgps is None:
+        if tgp is None:
+            raise ValueError("summarize() needs tgp or tgps")
+        return pd.DataFrame([summarize_rfp(data, tgp) for _, data in document_pairs(documents)],
+                            columns=SUMMARY_COLUMNS)
+    pairs = list(document_pairs(documents))
+    return pd.DataFrame([summarize_rfp(data, t) for t in tgps for _, data in pairs], columns=SUMMARY_COLUMNS)
+
+GPU_FAMILIES = ['B', 'H', 'R', 'L']
+
+def as_item_list(data):
+    if isinstance(data, dict):
+        return [data]
+    if isinstance(data, list):
+        return [item for item in data if isinstance(item, dict)]
+    return []
+
+def gpu_line_items(t1_data, t2_data):
+    # (gpu_count, item_count) pairs per GPU family, counted the same way as the
+    # B/H/R/L summary columns: B is the first b200_8way item in t1, H the first
+    # h200_ item in t1 (else in t2), and R/L every rtx6000_/l40s_ item in t1 and
+    # t2. R and L are computed from the formatted t1/t2 strings, which assume
+    # 8 GPUs per item, so 8 is used for them here as well.
+    t1_items = as_item_list(t1_data)
+    t2_items = as_item_list(t2_data)
+    def label(item):
+        value = item.get('item_label')
+        return value if isinstance(value, str) else ''
+    def counts(item, gpu_count=None):
+        try:
+            item_count = float(item.get('item_count', 0))
+        except (TypeError, ValueError):
+            return None
+        return (item.get('gpu_count', 0) if gpu_count is None else gpu_count, item_count)
+    items = {family: [] for family in GPU_FAMILIES}
+    for item in t1_items:
+        if label(item) == 'b200_8way':
+            items['B'].append(counts(item))
+            break
+    for item in t1_items + t2_items:
+        if label(item).startswith('h200_'):
+            items['H'].append(counts(item))
+            break
+    for item in t1_items + t2_items:
+        if label(item).startswith('rtx6000_'):
+            items['R'].append(counts(item, 8))
+        elif label(item).startswith('l40s_'):
+            items['L'].append(counts(item, 8))
+    return {family: [c for c in family_items if c is not None] for family, family_items in items.items()}
+
+def alpha_percent(tgp, price):
+    # Same value as the summary's alpha column: 1 / (price / tgp) * 100 rounded
+    # to 0.1% as '%.1f' does. np.round can land on the other side of a .x5
+    # boundary, so the few values next to one are formatted instead.
+    percent = 1 / (np.asarray(price, dtype=float) / np.asarray(tgp, dtype=float)) * 100
+    tenths = np.atleast_1d(np.round(percent * 10))
+    near = np.atleast_1d(np.abs(percent * 10 - np.floor(percent * 10) - 0.5) < 1e-6)
+    tenths[near] = [round(float(f"{p:.1f}") * 10) for p in np.atleast_1d(percent)[near]]
+    return (tenths / 10).reshape(np.shape(percent))
+
+def alpha_fraction(tgp, price):
+    # Same rounding as the summary: alpha is formatted to 0.1% before it is applied
+    return alpha_percent(tgp, price) / 100
+
+def adjusted_gpu_count(items, alpha):
+    # Sum of gpu_count * floor(item_count * alpha) over the items, for an array of alphas
+    total = np.zeros(np.shape(alpha), dtype=np.int64)
+    for gpu_count, item_count in items:
+        total += int(gpu_count) * np.floor(item_count * alpha).astype(np.int64)
+    return total
+
+def rfp_record(name, data):
+    rfp = data.get('rfp', {}) if isinstance(data, dict) else {}
+    total_price = rfp.get('total_price')
+    return {'name': name, 'document': data,
+            'rfp_no': rfp.get('rfp_no'), 'lead_org': rfp.get('lead_org'),
+            'total_price': float(total_price) if isinstance(total_price, (int, float)) else float('nan'),
+            'gpu_items': gpu_line_items(rfp.get('t1'), rfp.get('t2'))}
+
+def load_rfps(yaml_files=None):
+    # Parses the YAML files once into a list of RFP dicts (name, document,
+    # rfp_no, lead_org, numeric total_price and the gpu_line_items()), to be
+    # kept in memory and passed to summarize(), gpu_counts() or score_summary()
+    # for as many what-if evaluations as needed
+    return [rfp_record(name, data) for name, data in iter_yaml_documents(yaml_files)]
+
+def gpu_counts(rfps, tgps):
+    # The summary's B/H/R/L/T counts as arrays, for a list of RFPs (as from
+    # load_rfps(), or documents as taken by summarize()) and many TGPs at once:
+    #   orig      (rfp x family) offered GPU counts
+    #   adjusted  (TGP x rfp x family) counts after applying alpha
+    #   alpha     (TGP x rfp) alpha in percent, rounded to 0.1% as in the summary
+    # with families in the order B, H, R, L, T. An RFP without a usable
+    # total_price has NaN alpha and zero adjusted counts. All line items of all
+    # RFPs go through the alpha/floor step as one (TGP x item) array.
+    entries = rfps.items() if isinstance(rfps, dict) else rfps
+    rfps = [entry if isinstance(entry, dict) else rfp_record(*entry) for entry in entries]
+    tgp_grid = np.asarray(tgps, dtype=float)
+    prices = np.array([rfp['total_price'] for rfp in rfps], dtype=float)
+    slots, gpus, item_counts = [], [], []
+    for r, rfp in enumerate(rfps):
+        for f, family in enumerate(GPU_FAMILIES):
+            for gpu_count, item_count in rfp['gpu_items'][family]:
+                slots.append(r * len(GPU_FAMILIES) + f)
+                gpus.append(int(gpu_count))
+                item_counts.append(item_count)
+    slots, gpus, item_counts = np.array(slots, dtype=np.int64), np.array(gpus, dtype=np.int64), np.array(item_counts)
+    shape = (len(rfps), len(GPU_FAMILIES))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        percent = np.where((prices > 0)[None, :], alpha_percent(tgp_grid[:, None], prices[None, :]), np.nan)
+    alpha = percent / 100
+    orig = np.zeros(shape[0] * shape[1], dtype=np.int64)
+    np.add.at(orig, slots, (gpus * item_counts).astype(np.int64))
+    adjusted = np.zeros((shape[0] * shape[1], len(tgp_grid)), dtype=np.int64)
+    if len(slots):
+        item_alpha = alpha[:, slots // len(GPU_FAMILIES)]
+        counts = np.floor(np.nan_to_num(item_alpha * item_counts[None, :])).astype(np.int64)
+        np.add.at(adjusted, slots, (gpus[None, :] * counts).T)
+    orig = orig.reshape(shape)
+    adjusted = adjusted.reshape(shape + (len(tgp_grid),)).transpose(2, 0, 1)
+    return {'tgps': tgp_grid, 'names': [rfp['name'] for rfp in rfps],
+            'families': GPU_FAMILIES + ['T'],
+            'orig': np.concatenate([orig, orig.sum(axis=1, keepdims=True)], axis=1),
+            'adjusted': np.concatenate([adjusted, adjusted.sum(axis=2, keepdims=True)], axis=2),
+            'alpha': percent}
+
+def read_price_bands(bands_file):
+    # YAML mapping of rfp_no to {dist: uniform|normal|triangular, band: percent}
+    with open(bands_file, 'r') as file:
+        bands = yaml.safe_load(file) or {}
+    return {str(rfp_no): band for rfp_no, band in bands.items()}
+
+def sample_prices(total_price, dist, band, samples, rng):
+    # band is a +/- percentage around total_price; for 'normal' it is two standard
+    # deviations, so about 95% of the samples fall inside it
+    if dist == 'uniform':
+        delta = rng.uniform(-band, band, samples)
+    elif dist == 'normal':
+        delta = rng.normal(0.0, band / 2, samples)
+    elif dist == 'triangular':
+        delta = rng.triangular(-band, 0.0, band, samples)
+    else:
+        raise ValueError(f"Unknown price distribution: {dist}")
+    return total_price * np.maximum(1 + delta / 100, 1e-6)
+
+def monte_carlo_summary(documents, tgps, dist, band, samples, percentiles, price_bands=None, seed=None):
+    # Percentiles of the adjusted B/H/R/L/T counts and of alpha per RFP and TGP,
+    # with total_price drawn from a percentage band around the quoted price.
+    # documents is anything document_pairs() takes, e.g. load_rfps().
+    # All samples and TGPs for an RFP are evaluated as one (TGP x sample) array.
+    rng = np.random.default_rng(seed)
+    price_bands = price_bands or {}
+    tgp_grid = np.asarray(tgps, dtype=float)[:, None]
+    rows = []
+    for row in rfp_rows(documents):
+        total_price = row['total_price']
+        if not isinstance(total_price, (int, float, np.number)) or not total_price > 0:
+            print(f"Skipping RFP {row['rfp_no']}: no usable total_price")
+            continue
+        rfp_band = price_bands.get(str(row['rfp_no']), {})
+        rfp_dist = rfp_band.get('dist', dist)
+        rfp_pct = float(rfp_band.get('band', band))
+        prices = sample_prices(float(total_price), rfp_dist, rfp_pct, samples, rng)
+        alpha = alpha_fraction(tgp_grid, prices[None, :])
+        items = gpu_line_items(row['t1'], row['t2'])
+        adjusted = {family: adjusted_gpu_count(items[family], alpha) for family in GPU_FAMILIES}
+        adjusted['T'] = sum(adjusted[family] for family in GPU_FAMILIES)
+        adjusted['alpha'] = alpha * 100
+        for name, values in adjusted.items():
+            stats = np.percentile(values, percentiles, axis=1)
+            means = values.mean(axis=1)
+            for k, tgp in enumerate(tgps):
+                result = {'rfp_no': row['rfp_no'], 'lead_org': row['lead_org'],
+                          'total_price': row['total_price'], 'TGP': tgp,
+                          'dist': rfp_dist, 'band': f"{rfp_pct:g}%", 'value': name,
+                          'mean': round(float(means[k]), 2)}
+                for q, stat in zip(percentiles, stats[:, k]):
+                    result[f"p{q:g}"] = round(float(stat), 2)
+                rows.append(result)
+    return pd.DataFrame(rows)
+
+GPU_FAMILY_PREFIXES = {'B': 'b200_', 'H': 'h200_', 'R': 'rtx6000_', 'L': 'l40s_'}
+# Rough defaults, override with --h200-equiv and per-item power_kw fields
+H200_EQUIVALENT = {'B': 2.0, 'H': 1.0, 'R': 0.5, 'L': 0.4}
+GPU_POWER_KW = {'B': 1.0, 'H': 0.7, 'R': 0.6, 'L': 0.35}
+
+def parse_family_values(text):
+    # 'B=2,H=1' -> {'B': 2.0, 'H': 1.0}
+    values = {}
+    for part in text.split(','):
+        family, value = part.split('=')
+        values[family.strip().upper()] = float(value)
+    return values
+
+def optimizer_line_items(documents, h200_equiv, max_scale=1.0):
+    # GPU line items of t1/t2 across all RFPs; documents is anything
+    # document_pairs() takes. The unit price is the item's unit_price field when
+    # present; otherwise the RFP's total_price, less any explicit unit prices,
+    # is split over its other GPU items by GPU count.
+    line_items = []
+    for row in rfp_rows(documents):
+        total_price = row['total_price']
+        if not isinstance(total_price, (int, float, np.number)) or not total_price > 0:
+            print(f"Skipping RFP {row['rfp_no']}: no usable total_price")
+            continue
+        rfp_items = []
+        for node in ['t1', 't2']:
+            for item in as_item_list(row[node]):
+                item_label = item.get('item_label')
+                family = next((f for f, prefix in GPU_FAMILY_PREFIXES.items()
+                               if isinstance(item_label, str) and item_label.startswith(prefix)), None)
+                try:
+                    item_count = int(item.get('item_count', 0))
+                except (TypeError, ValueError):
+                    continue
+                if family is None or item_count <= 0:
+                    continue
+                gpu_count = item.get('gpu_count') or 8
+                rfp_items.append({
+                    'rfp_no': row['rfp_no'], 'lead_org': row['lead_org'], 'node': node,
+                    'item_label': item_label, 'family': family, 'gpu_count': gpu_count,
+                    'offered': item_count, 'max_count': math.floor(item_count * max_scale),
+                    'unit_price': item.get('unit_price'),
+                    'unit_power_kw': item.get('power_kw', gpu_count * GPU_POWER_KW[family]),
+                    'unit_value': gpu_count * h200_equiv.get(family, 0.0),
+                })
+        priced = sum(item['unit_price'] * item['offered'] for item in rfp_items if item['unit_price'] is not None)
+        unpriced_gpus = sum(item['gpu_count'] * item['offered'] for item in rfp_items if item['unit_price'] is None)
+        for item in rfp_items:
+            if item['unit_price'] is None:
+                item['unit_price'] = max(float(row['total_price']) - priced, 0.0) * item['gpu_count'] / unpriced_gpus
+        line_items.extend(rfp_items)
+    return line_items
+
+def optimize_budget(line_items, budget, power_cap=None, budget_steps=1000, power_steps=100):
+    # Bounded knapsack over integer item counts, maximizing total unit_value with
+    # cost <= budget (and power <= power_cap if given). The result is approximate:
+    # costs and powers are rounded up onto a grid of budget_steps x power_steps
+    # cells, so a solution never exceeds the real limits but may leave some
+    # budget unused. Each bounded item is split into 1, 2, 4, ... sized 0/1
+    # chunks, each chunk's cost rounded once, and every chunk updates the whole
+    # DP grid as one NumPy operation; the take masks are bit-packed for
+    # reconstruction. Leftover budget is then filled at exact costs.
+    if budget <= 0 or (power_cap is not None and power_cap <= 0):
+        raise ValueError("Budget and power cap must be positive")
+    grid_shape = (budget_steps + 1, power_steps + 1 if power_cap is not None else 1)
+    best = np.zeros(grid_shape)
+    chunks = []
+    for index, item in enumerate(line_items):
+        remaining = item['max_count']
+        size = 1
+        while remaining > 0:
+            count = min(size, remaining)
+            remaining -= count
+            size *= 2
+            w = max(1, math.ceil(count * item['unit_price'] / budget * budget_steps - 1e-9))
+            p = math.ceil(count * item['unit_power_kw'] / power_cap * power_steps - 1e-9) if power_cap is not None else 0
+            if w >= grid_shape[0] or p >= grid_shape[1] or item['unit_value'] <= 0:
+                continue
+            candidate = best[:grid_shape[0] - w, :grid_shape[1] - p] + count * item['unit_value']
+            take = candidate > best[w:, p:]
+            best[w:, p:] = np.where(take, candidate, best[w:, p:])
+            chunks.append((index, count, w, p, take.shape, np.packbits(take, axis=None)))
+    chosen = [0] * len(line_items)
+    c0, c1 = grid_shape[0] - 1, grid_shape[1] - 1
+    for index, count, w, p, shape, packed in reversed(chunks):
+        if c0 >= w and c1 >= p:
+            flat = (c0 - w) * shape[1] + (c1 - p)
+            if (packed[flat // 8] >> (7 - flat % 8)) & 1:
+                chosen[index] += count
+                c0, c1 = c0 - w, c1 - p
+    return fill_budget(line_items, chosen, budget, power_cap)
+
+def fill_budget(line_items, chosen, budget, power_cap=None):
+    # Adds whole units, best unit_value per unit_price first, while their exact
+    # cost (and power) still fits in what the grid rounding left over
+    cost = sum(count * item['unit_price'] for item, count in zip(line_items, chosen))
+    power = sum(count * item['unit_power_kw'] for item, count in zip(line_items, chosen))
+    order = sorted(range(len(line_items)),
+                   key=lambda i: -line_items[i]['unit_value'] / max(line_items[i]['unit_price'], 1e-12))
+    for index in order:
+        item = line_items[index]
+        extra = item['max_count'] - chosen[index]
+        if item['unit_value'] <= 0 or extra <= 0:
+            continue
+        if item['unit_price'] > 0:
+            extra = min(extra, math.floor((budget - cost) / item['unit_price']))
+        if power_cap is not None and item['unit_power_kw'] > 0:
+            extra = min(extra, math.floor((power_cap - power) / item['unit_power_kw']))
+        if extra > 0:
+            chosen[index] += extra
+            cost += extra * item['unit_price']
+            power += extra * item['unit_power_kw']
+    return chosen
+
+OPTIMIZATION_COLUMNS = ['rfp_no', 'lead_org', 'node', 'item_label', 'family', 'chosen',
+                        'unit_price', 'cost', 'gpus', 'h200_equiv', 'power_kw']
+
+def optimization_summary(line_items, chosen):
+    rows = []
+    for item, count in zip(line_items, chosen):
+        rows.append({
+            'rfp_no': item['rfp_no'], 'lead_org': item['lead_org'], 'node': item['node'],
+            'item_label': item['item_label'], 'family': item['family'],
+            'chosen': f"{count}/{item['offered']}",
+            'unit_price': round(item['unit_price'], 6), 'cost': round(count * item['unit_price'], 6),
+            'gpus': count * item['gpu_count'], 'h200_equiv': round(count * item['unit_value'], 2),
+            'power_kw': round(count * item['unit_power_kw'], 2),
+        })
+    return pd.DataFrame(rows, columns=OPTIMIZATION_COLUMNS)
+
+# Rough dense per-GPU figures (TFLOPS without sparsity, HBM in GB, TDP in W);
+# override with --perf-table
+GPU_PERFORMANCE = {
+    'B': {'fp8_tflops': 4500.0, 'fp16_tflops': 2250.0, 'hbm_gb': 180.0, 'tdp_w': 1000.0},
+    'H': {'fp8_tflops': 1979.0, 'fp16_tflops': 989.0, 'hbm_gb': 141.0, 'tdp_w': 700.0},
+    'R': {'fp8_tflops': 728.0, 'fp16_tflops': 364.0, 'hbm_gb': 48.0, 'tdp_w': 300.0},
+    'L': {'fp8_tflops': 733.0, 'fp16_tflops': 362.0, 'hbm_gb': 48.0, 'tdp_w': 350.0},
+}
+SCORE_COLUMNS = ['eff_tflops', 'hbm_gb', 'power_kw', 'spend', 'tflops_per_price', 'hbm_per_price']
+
+def read_perf_table(perf_file=None):
+    # GPU_PERFORMANCE with the fields given in a YAML mapping of family to
+    # {fp8_tflops, fp16_tflops, hbm_gb, tdp_w} replaced
+    perf = {family: dict(values) for family, values in GPU_PERFORMANCE.items()}
+    if perf_file:
+        with open(perf_file, 'r') as file:
+            overrides = yaml.safe_load(file) or {}
+        for family, values in overrides.items():
+            perf.setdefault(str(family).upper(), {}).update(values)
+    return perf
+
+def perf_weights(perf, precision='fp8'):
+    # (family x [TFLOPS, HBM GB, kW]) matrix in GPU_FAMILIES order
+    return np.array([[float(perf.get(family, {}).get(f'{precision}_tflops', 0.0)),
+                      float(perf.get(family, {}).get('hbm_gb', 0.0)),
+                      float(perf.get(family, {}).get('tdp_w', 0.0)) / 1000]
+                     for family in GPU_FAMILIES])
+
+def rfp_scores(documents, tgps, weights):
+    # Yields (rfp, scores) per RFP with a usable total_price, scores being a
+    # {SCORE_COLUMNS name: array over tgps} for the adjusted configuration at
+    # each TGP. The adjusted (TGP x family) counts are weighted as one matrix
+    # product; spend is alpha * total_price, so rounding losses lower the
+    # per-price figures.
+    tgp_grid = np.asarray(tgps, dtype=float)
+    for name, data in document_pairs(documents):
+        rfp = data.get('rfp', {})
+        total_price = rfp.get('total_price')
+        if not isinstance(total_price, (int, float)) or total_price <= 0:
+            print(f"Skipping {name}: no usable total_price")
+            continue
+        alpha = alpha_fraction(tgp_grid, total_price)
+        items = gpu_line_items(rfp.get('t1'), rfp.get('t2'))
+        counts = np.stack([adjusted_gpu_count(items[family], alpha) for family in GPU_FAMILIES], axis=1)
+        tflops, hbm_gb, power_kw = (counts @ weights).T
+        spend = alpha * total_price
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scores = {'eff_tflops': tflops, 'hbm_gb': hbm_gb, 'power_kw': power_kw, 'spend': spend,
+                      'tflops_per_price': np.where(spend > 0, tflops / spend, 0.0),
+                      'hbm_per_price': np.where(spend > 0, hbm_gb / spend, 0.0)}
+        # Rounded as reported, so rankings are not decided by float noise
+        yield rfp, {col: np.round(values, 4) for col, values in scores.items()}
+
+def score_row(rfp, tgp, scores, k):
+    row = {'rfp_no': rfp.get('rfp_no'), 'lead_org': rfp.get('lead_org'),
+           'total_price': rfp.get('total_price'), 'TGP': tgp}
+    for col in SCORE_COLUMNS:
+        row[col] = float(scores[col][k])
+    return row
+
+def score_summary(documents, tgps, perf=None, precision='fp8'):
+    # One row per RFP and TGP with the capability-weighted SCORE_COLUMNS
+    weights = perf_weights(perf or GPU_PERFORMANCE, precision)
+    rows = [score_row(rfp, tgp, scores, k)
+            for rfp, scores in rfp_scores(documents, tgps, weights)
+            for k, tgp in enumerate(tgps)]
+    return pd.DataFrame(rows, columns=['rfp_no', 'lead_org', 'total_price', 'TGP'] + SCORE_COLUMNS)
+
+def top_k_scores(documents, tgps, k, rank_by='tflops_per_price', perf=None, precision='fp8'):
+    # The k best RFPs by rank_by at each TGP. A size-k min-heap is kept per TGP
+    # and an RFP is only pushed where it beats the current k-th best, so the
+    # full RFP x TGP result set is never built or sorted. Ties go to the RFP
+    # read first.
+    weights = perf_weights(perf or GPU_PERFORMANCE, precision)
+    heaps = [[] for _ in tgps]
+    threshold = np.full(len(tgps), -np.inf)
+    for index, (rfp, scores) in enumerate(rfp_scores(documents, tgps, weights)):
+        values = scores[rank_by]
+        for t in np.flatnonzero(values > threshold):
+            entry = (float(values[t]), -index, score_row(rfp, tgps[t], scores, t))
+            if len(heaps[t]) < k:
+                heapq.heappush(heaps[t], entry)
+            else:
+                heapq.heappushpop(heaps[t], entry)
+            if len(heaps[t]) == k:
+                threshold[t] = heaps[t][0][0]
+    rows = []
+    for heap in heaps:
+        for rank, (_, _, row) in enumerate(sorted(heap, reverse=True), start=1):
+            rows.append({'rank': rank, **row})
+    return pd.DataFrame(rows, columns=['TGP', 'rank', 'rfp_no', 'lead_org', 'total_price'] + SCORE_COLUMNS)
+
+def store_results(db_file, yaml_files, tgp, batch_size=500):
+    # Summarizes the YAML files at tgp like summarize(), adding the RFPs, line
+    # items and summary rows to the SQLite store as it goes, one transaction per
+    # file; returns the summary DataFrame. Each document is parsed and
+    # summarized once for both. Files already stored (same content hash) keep
+    # their rows and only get summaries for a TGP they lack.
+    conn = open_store(db_file)
+    rows = []
+    loaded = skipped = 0
+    try:
+        for file_name in yaml_files:
+            file_hash = file_digest(file_name)
+            if file_hash is None:
+                print(f"Error reading {file_name}: file not found")
+                continue
+            with conn:
+                rfp_ids = None
+                if file_is_stored(conn, file_hash):
+                    skipped += 1
+                    rfp_ids = stored_rfp_ids(conn, file_hash)
+                    new_tgp = tgp not in stored_tgps(conn, rfp_ids)
+                else:
+                    loaded += 1
+                    new_tgp = True
+                add_file(conn, file_hash, file_name)
+                batch = []
+                for name, data in iter_yaml_documents([file_name]):
+                    batch.append(((name, data), summarize_rfp(data, tgp)))
+                    if len(batch) == batch_size:
+                        store_batch(conn, file_hash, batch, tgp, rfp_ids, new_tgp)
+                        rows.extend(row for _, row in batch)
+                        batch = []
+                store_batch(conn, file_hash, batch, tgp, rfp_ids, new_tgp)
+                rows.extend(row for _, row in batch)
+    finally:
+        conn.close()
+    print(f"Stored results in {db_file} ({loaded} new file(s), {skipped} unchanged file(s) skipped)")
+    return pd.DataFrame(rows, columns=SUMMARY_COLUMNS)
+
+def store_batch(conn, file_hash, batch, tgp, stored_ids=None, new_tgp=True):
+    # batch is a list of ((name, document), summary row). stored_ids holds the
+    # rfp_ids of an already stored file, consumed in document order; otherwise
+    # the documents are added as new RFPs.
+    if not batch:
+        return
+    if stored_ids is None:
+        rfp_ids = add_rfps(conn, file_hash, [document for document, _ in batch])
+    else:
+        rfp_ids = stored_ids[:len(batch)]
+        del stored_ids[:len(batch)]
+    if new_tgp:
+        add_summaries(conn, ((rfp_id, tgp, row) for rfp_id, (_, row) in zip(rfp_ids, batch)))
+
+def main(argv=None):
+    # Set up argument parser
+    parser = argparse.ArgumentParser(description='Process YAML files and calculate alpha values.')
+    parser.add_argument('--tgp', type=float, default=1.7, help='Target ST1 price (default: 1.7)')
+    parser.add_argument('--yaml-files', nargs='+', default=YAML_FILES, help='YAML files to read; each may hold several ---separated RFP documents (default: 1.yaml ... 5.yaml)')
+    parser.add_argument('--monte-carlo', action='store_true', help='Report percentiles of adjusted GPU counts under price uncertainty instead of the summary')
+    parser.add_argument('--tgps', type=float, nargs='+', help='TGP values for --monte-carlo and --score (default: the --tgp value)')
+    parser.add_argument('--samples', type=int, default=100000, help='Price samples per RFP for --monte-carlo (default: 100000)')
+    parser.add_argument('--price-dist', choices=['uniform', 'normal', 'triangular'], default='uniform', help='Price distribution for --monte-carlo (default: uniform)')
+    parser.add_argument('--price-band', type=float, default=10.0, help='Price band in +/- percent of total_price for --monte-carlo (default: 10)')
+    parser.add_argument('--price-bands', help='YAML file of per-RFP {dist, band} overrides keyed by rfp_no, for --monte-carlo')
+    parser.add_argument('--percentiles', type=float, nargs='+', default=[5, 25, 50, 75, 95], help='Percentiles to report for --monte-carlo (default: 5 25 50 75 95)')
+    parser.add_argument('--seed', type=int, help='Random seed for --monte-carlo')
+    parser.add_argument('--optimize', action='store_true', help='Choose the mix of GPU line items across RFPs that maximizes H200-equivalent GPUs within the --tgp budget')
+    parser.add_argument('--power-cap', type=float, help='Power cap in kW for --optimize')
+    parser.add_argument('--h200-equiv', default='B=2.0,H=1.0,R=0.5,L=0.4', help='H200-equivalents per GPU for --optimize (default: B=2.0,H=1.0,R=0.5,L=0.4)')
+    parser.add_argument('--max-scale', type=float, default=1.0, help='Upper bound on each item count as a multiple of the offered count for --optimize (default: 1.0)')
+    parser.add_argument('--budget-steps', type=int, default=1000, help='Budget resolution for --optimize (default: 1000)')
+    parser.add_argument('--power-steps', type=int, default=100, help='Power resolution for --optimize with --power-cap (default: 100)')
+    parser.add_argument('--score', action='store_true', help='Report capability-weighted TFLOPS, HBM and power of the adjusted configuration and their value per price instead of the summary')
+    parser.add_argument('--perf-table', help='YAML file of per-family {fp8_tflops, fp16_tflops, hbm_gb, tdp_w} overrides, for --score')
+    parser.add_argument('--precision', choices=['fp8', 'fp16'], default='fp8', help='TFLOPS figure to weight GPUs by for --score (default: fp8)')
+    parser.add_argument('--top-k', type=int, help='Only report the best K RFPs at each TGP, for --score')
+    parser.add_argument('--rank-by', choices=SCORE_COLUMNS, default='tflops_per_price', help='Column to rank by for --top-k (default: tflops_per_price)')
+    parser.add_argument('--db', help='Also store the RFPs, line items and summary rows in this SQLite database')
+    parser.add_argument('--force', action='store_true', help='Regenerate the output even if its inputs and options are unchanged')
+    args = parser.parse_args(argv)
+    if args.top_k is not None and args.top_k < 1:
+        parser.error('--top-k must be at least 1')
+    if args.monte_carlo:
+        if args.samples < 1:
+            parser.error('--samples must be at least 1')
+        if args.price_band < 0:
+            parser.error('--price-band must not be negative')
+    if args.optimize:
+        if args.tgp <= 0:
+            parser.error('--tgp must be positive with --optimize')
+        if args.power_cap is not None and args.power_cap <= 0:
+            parser.error('--power-cap must be positive')
+        if args.budget_steps < 1 or args.power_steps < 1:
+            parser.error('--budget-steps and --power-steps must be at least 1')
+    if args.db and (args.optimize or args.monte_carlo or args.score):
+        parser.error('--db only applies to the summary, not to --optimize, --monte-carlo or --score')
     
-    # Write DataFrame to CSV
     tgp_str = str(args.tgp).replace('.', 'p')
-    df.to_csv(f'summary_ST1-{tgp_str}.csv', index=False)
-    print(f"\nData has been written to summary_ST1-{tgp_str}.csv (using TGP value: {args.tgp})") 
+    tgps = args.tgps or [args.tgp]
+    if args.optimize:
+        output_file = f'optimize_ST1-{tgp_str}.csv'
+    elif args.monte_carlo or args.score:
+        tgp_strs = [str(tgp).replace('.', 'p') for tgp in tgps]
+        mc_name = tgp_strs[0] if len(tgps) == 1 else f"TGP{tgp_strs[0]}-{tgp_strs[-1]}"
+        if args.monte_carlo:
+            output_file = f'mc_ST1-{mc_name}.csv'
+        else:
+            output_file = f"{'top' + str(args.top_k) if args.top_k else 'score'}_ST1-{mc_name}.csv"
+    else:
+        output_file = f'summary_ST1-{tgp_str}.csv'
+    
+    # Skip the run if the output was built from the same inputs and options. The
+    # database is not covered by the manifest, so a --db run always goes ahead
+    # (the store itself skips what it already holds).
+    manifest = load_manifest()
+    input_files = args.yaml_files + [f for f in [args.price_bands, args.perf_table] if f]
+    options = {k: v for k, v in vars(args).items() if k not in ('force', 'db')}
+    build_id = build_key('read_yamls', __file__, input_files, options, manifest)
+    if not args.force and not args.db and is_up_to_date(manifest, [output_file], build_id):
+        print(f"{output_file} is up to date, skipping (use --force to regenerate)")
+        return
+    
+    # Set display options for the printed tables, leaving the caller's options
+    # untouched when main() is called in-process
+    with pd.option_context('display.max_columns', None, 'display.max_rows', None,
+                           'display.width', 1000, 'display.max_colwidth', None):
+        if args.optimize:
+            line_items = optimizer_line_items(iter_yaml_documents(args.yaml_files), parse_family_values(args.h200_equiv), args.max_scale)
+            chosen = optimize_budget(line_items, args.tgp, args.power_cap, args.budget_steps, args.power_steps)
+            opt_df = optimization_summary(line_items, chosen)
+        
+            print(f"\nBudget allocation (budget: {args.tgp}" + (f", power cap: {args.power_cap} kW" if args.power_cap is not None else "")
+                  + f"; approximate, costs rounded to 1/{args.budget_steps} of the budget):")
+            print(opt_df[opt_df['gpus'] > 0])
+            print("\nChosen configuration per vendor:")
+            print(opt_df.groupby('lead_org')[['cost', 'gpus', 'h200_equiv', 'power_kw']].sum())
+            print(f"\nTotal cost: {opt_df['cost'].sum():.4f}, H200-equivalent GPUs: {opt_df['h200_equiv'].sum():.1f}, power: {opt_df['power_kw'].sum():.1f} kW")
+        
+            # Write DataFrame to CSV
+            opt_df.to_csv(output_file, index=False)
+            print(f"\nData has been written to {output_file} (using budget: {args.tgp})")
+        elif args.monte_carlo:
+            price_bands = read_price_bands(args.price_bands) if args.price_bands else None
+            mc_df = monte_carlo_summary(iter_yaml_documents(args.yaml_files), tgps, args.price_dist, args.price_band, args.samples,
+                                        args.percentiles, price_bands, args.seed)
+        
+            print(f"\nMonte Carlo price uncertainty ({args.samples} samples per RFP):")
+            print(mc_df)
+        
+            # Write DataFrame to CSV
+            mc_df.to_csv(output_file, index=False)
+            print(f"\nData has been written to {output_file} (using TGP values: {', '.join(str(tgp) for tgp in tgps)})")
+        elif args.score:
+            perf = read_perf_table(args.perf_table)
+            documents = iter_yaml_documents(args.yaml_files)
+            if args.top_k:
+                score_df = top_k_scores(documents, tgps, args.top_k, args.rank_by, perf, args.precision)
+                print(f"\nTop {args.top_k} RFPs per TGP by {args.rank_by} ({args.precision}):")
+            else:
+                score_df = score_summary(documents, tgps, perf, args.precision)
+                print(f"\nCapability-weighted scores ({args.precision}):")
+            print(score_df)
+        
+            # Write DataFrame to CSV
+            score_df.to_csv(output_file, index=False)
+            print(f"\nData has been written to {output_file} (using TGP values: {', '.join(str(tgp) for tgp in tgps)})")
+        else:
+            if args.db:
+                df = store_results(args.db, args.yaml_files, args.tgp)
+            else:
+                df = summarize(iter_yaml_documents(args.yaml_files), args.tgp)
+        
+            print("\nPandas DataFrame (showing item_label and item_count values):")
+            print(df)
+        
+            # Write DataFrame to CSV
+            df.to_csv(output_file, index=False)
+            print(f"\nData has been written to {output_file} (using TGP value: {args.tgp})")
+    
+    record_outputs(manifest, [output_file], build_id)
+
+if __name__ == "__main__":
+    main()
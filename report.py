@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import math
+import sys
+from datetime import datetime
+
+import numpy as np
+
+import csv_to_pp
+import yaml_to_pp
+from read_yamls import (YAML_FILES, GPU_FAMILIES, read_yaml_files, iter_yaml_documents, summarize,
+                        gpu_line_items, alpha_percent, adjusted_gpu_count)
+from build_manifest import load_manifest, build_key, is_up_to_date, record_outputs
+from html_render import page_head, asset_paths, PAGE_END
+
+REPORT_STYLES = [yaml_to_pp.STYLE, csv_to_pp.STYLE]
+REPORT_SCRIPTS = [yaml_to_pp.SCRIPT, csv_to_pp.SCRIPT]
+CHART_FAMILIES = GPU_FAMILIES + ['T']
+
+CHARTS_STYLE = """        .container {
+            width: 100%;
+        }
+        .legend {
+            margin-bottom: 15px;
+            font-size: 0.9em;
+        }
+        .legend span {
+            margin-right: 15px;
+        }
+        .legend i {
+            display: inline-block;
+            width: 14px;
+            height: 3px;
+            margin-right: 4px;
+            vertical-align: middle;
+        }
+        .charts {
+            display: grid;
+            grid-template-columns: repeat(auto-fill, minmax(340px, 1fr));
+            gap: 12px;
+        }
+        .chart {
+            background-color: white;
+            border: 1px solid #ddd;
+            border-radius: 4px;
+            padding: 8px;
+        }
+        .chart-title {
+            font-weight: bold;
+            color: #333;
+            font-size: 0.9em;
+        }
+        .chart-info {
+            color: #7f8c8d;
+            font-size: 0.8em;
+            height: 1.3em;
+            white-space: nowrap;
+            overflow: hidden;
+        }
+        .chart canvas {
+            width: 100%;
+            height: 160px;
+            display: block;
+        }"""
+
+CHARTS_SCRIPT = """        // Step charts of the adjusted GPU counts and alpha per RFP, drawn from the
+        // sweep embedded by report.py. Each series is stored as its change points
+        // [v0, i1, v1, i2, v2, ...] (value v_k from TGP index i_k on), alpha in
+        // tenths of a percent, so the page stays small for fine TGP steps.
+        var CHART_COLORS = {B: '#8e44ad', H: '#2980b9', R: '#27ae60', L: '#e67e22', T: '#2c3e50'};
+        var sweep = null;
+
+        function decodeSteps(steps, n) {
+            var values = new Int32Array(n);
+            var value = steps[0], next = 1;
+            for (var i = 0; i < n; i++) {
+                if (next < steps.length && steps[next] === i) {
+                    value = steps[next + 1];
+                    next += 2;
+                }
+                values[i] = value;
+            }
+            return values;
+        }
+
+        function rfpSeries(rfp) {
+            if (!rfp.values) {
+                var n = sweep.tgps.length;
+                rfp.values = rfp.series.map(steps => decodeSteps(steps, n));
+                rfp.alpha = Float64Array.from(decodeSteps(rfp.alpha_steps, n), tenths => tenths / 10);
+            }
+            return rfp;
+        }
+
+        function drawChart(canvas, rfp) {
+            rfpSeries(rfp);
+            var tgps = sweep.tgps, n = tgps.length;
+            var ratio = window.devicePixelRatio || 1;
+            var w = canvas.clientWidth, h = canvas.clientHeight;
+            canvas.width = w * ratio;
+            canvas.height = h * ratio;
+            var ctx = canvas.getContext('2d');
+            ctx.scale(ratio, ratio);
+            var left = 36, right = 40, top = 8, bottom = 18;
+            var plotW = w - left - right, plotH = h - top - bottom;
+            var span = n > 1 ? tgps[n - 1] - tgps[0] : 1;
+            var x = i => left + (n > 1 ? (tgps[i] - tgps[0]) / span : 0.5) * plotW;
+            var yMax = Math.max(1, ...rfp.values.map(v => Math.max(...v)));
+            var y = v => top + plotH - v / yMax * plotH;
+            var aMin = Math.min(...rfp.alpha), aMax = Math.max(...rfp.alpha);
+            if (aMax === aMin) aMax = aMin + 1;
+            var ya = a => top + plotH - (a - aMin) / (aMax - aMin) * plotH;
+
+            ctx.strokeStyle = '#ddd';
+            ctx.strokeRect(left, top, plotW, plotH);
+            ctx.fillStyle = '#7f8c8d';
+            ctx.font = '10px sans-serif';
+            ctx.textAlign = 'right';
+            ctx.fillText(yMax, left - 3, top + 8);
+            ctx.fillText('0', left - 3, top + plotH);
+            ctx.textAlign = 'left';
+            ctx.fillText(aMax.toFixed(1) + '%', left + plotW + 3, top + 8);
+            ctx.fillText(aMin.toFixed(1) + '%', left + plotW + 3, top + plotH);
+            ctx.fillText(tgps[0], left, h - 4);
+            ctx.textAlign = 'right';
+            ctx.fillText(tgps[n - 1], left + plotW, h - 4);
+
+            sweep.families.forEach((family, f) => {
+                var values = rfp.values[f];
+                ctx.strokeStyle = CHART_COLORS[family];
+                ctx.lineWidth = family === 'T' ? 2 : 1.2;
+                ctx.beginPath();
+                ctx.moveTo(x(0), y(values[0]));
+                for (var i = 1; i < n; i++) {
+                    if (values[i] !== values[i - 1]) {
+                        ctx.lineTo(x(i), y(values[i - 1]));
+                        ctx.lineTo(x(i), y(values[i]));
+                    }
+                }
+                ctx.lineTo(x(n - 1), y(values[n - 1]));
+                ctx.stroke();
+            });
+            ctx.strokeStyle = '#c0392b';
+            ctx.lineWidth = 1;
+            ctx.setLineDash([3, 3]);
+            ctx.beginPath();
+            for (var i = 0; i < n; i++) {
+                if (i === 0) ctx.moveTo(x(i), ya(rfp.alpha[i])); else ctx.lineTo(x(i), ya(rfp.alpha[i]));
+            }
+            ctx.stroke();
+            ctx.setLineDash([]);
+
+            canvas.onmousemove = event => {
+                // Nearest TGP to the pointer, as the TGP values need not be evenly spaced
+                var tgp = tgps[0] + (event.offsetX - left) / plotW * span;
+                var lo = 0, hi = n - 1;
+                while (lo < hi) {
+                    var mid = (lo + hi) >> 1;
+                    if (tgps[mid] < tgp) lo = mid + 1; else hi = mid;
+                }
+                var i = lo > 0 && tgp - tgps[lo - 1] < tgps[lo] - tgp ? lo - 1 : lo;
+                canvas.previousElementSibling.textContent = 'TGP ' + tgps[i] + ': ' +
+                    sweep.families.map((family, f) => family + ' ' + rfp.values[f][i]).join(', ') +
+                    ', alpha ' + rfp.alpha[i].toFixed(1) + '%';
+            };
+        }
+
+        function initCharts() {
+            sweep = JSON.parse(document.getElementById('sweep-data').textContent);
+            var container = document.getElementById('charts');
+            var frag = document.createDocumentFragment();
+            sweep.rfps.forEach((rfp, r) => {
+                var card = document.createElement('div');
+                card.className = 'chart';
+                var title = document.createElement('div');
+                title.className = 'chart-title';
+                title.textContent = rfp.name + ' \u00b7 RFP ' + rfp.rfp_no + ' \u00b7 ' + rfp.lead_org + ' \u00b7 price ' + rfp.price;
+                var info = document.createElement('div');
+                info.className = 'chart-info';
+                var canvas = document.createElement('canvas');
+                canvas.dataset.rfp = r;
+                card.append(title, info, canvas);
+                frag.appendChild(card);
+            });
+            container.appendChild(frag);
+            // Draw charts only as they scroll into view
+            var observer = new IntersectionObserver(entries => {
+                entries.forEach(entry => {
+                    if (entry.isIntersecting) {
+                        observer.unobserve(entry.target);
+                        drawChart(entry.target, sweep.rfps[Number(entry.target.dataset.rfp)]);
+                    }
+                });
+            });
+            container.querySelectorAll('canvas').forEach(canvas => observer.observe(canvas));
+        }"""
+
+def tgp_range(start, stop, step):
+    # Inclusive range, rounded so that e.g. 1.6 is not 1.6000000000000001
+    count = int(math.floor((stop - start) / step + 1e-9)) + 1
+    return [round(start + i * step, 10) for i in range(count)]
+
+def csv_cell(value):
+    # The text df.to_csv writes for a cell
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ''
+    return str(value)
+
+def dataframe_rows(df):
+    # Header and data rows as lists of strings, the same rows csv_to_pp.py
+    # would read back from the CSV written by read_yamls.py
+    return [list(df.columns)] + [[csv_cell(value) for value in row] for row in df.itertuples(index=False)]
+
+def summary_tables(yaml_data, tgps, write_csv=False):
+    # One table per TGP, keyed by the summary CSV name read_yamls.py would use
+    tables = {}
+    for tgp in tgps:
+        df = summarize(yaml_data, tgp)
+        tgp_str = str(tgp).replace('.', 'p')
+        csv_file = f'summary_ST1-{tgp_str}.csv'
+        if write_csv:
+            df.to_csv(csv_file, index=False)
+            print(f"Data has been written to {csv_file} (using TGP value: {tgp})")
+        tables[csv_file] = dataframe_rows(df)
+    return tables
+
+def report_to_html(tables, yaml_data, output_file, assets_dir=None):
+    # Summary tabs from csv_to_pp.py followed by YAML tabs from yaml_to_pp.py
+    search_index = yaml_to_pp.new_search_index()
+    yaml_contents = yaml_to_pp.generate_tab_contents(yaml_data, search_index, first_active=False)
+    html_content = page_head('ST1 Report', REPORT_STYLES, REPORT_SCRIPTS, output_file, assets_dir) + f"""    <div class="container">
+        <h1>ST1 Report</h1>
+        <div class="tabs">
+{csv_to_pp.generate_tabs(tables)}
+{yaml_to_pp.generate_tabs(yaml_data, first_active=False)}
+        </div>
+{yaml_to_pp.CONTROLS}
+{csv_to_pp.generate_tab_contents(tables)}
+{yaml_contents}
+        <div class="timestamp">Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</div>
+    </div>
+    <script type="application/json" id="search-index">{yaml_to_pp.search_index_json(search_index)}</script>
+""" + PAGE_END
+    with open(output_file, 'w', encoding='utf-8') as f:
+        f.write(html_content)
+    return output_file
+
+def encode_steps(values):
+    # [v0, i1, v1, i2, v2, ...]: value v0 from index 0, then v_k from index i_k
+    changes = np.flatnonzero(np.diff(values)) + 1
+    steps = [int(values[0])]
+    for i in changes:
+        steps.extend([int(i), int(values[i])])
+    return steps
+
+def sweep_series(documents, tgps):
+    # Adjusted B/H/R/L/T counts and alpha (in tenths of a percent) over the
+    # whole TGP grid for each RFP, computed as one array operation per family,
+    # with the same counting and alpha rounding as the summary columns
+    tgp_grid = np.asarray(tgps, dtype=float)
+    rfps = []
+    for name, data in documents:
+        rfp = data.get('rfp', {})
+        total_price = rfp.get('total_price')
+        if not isinstance(total_price, (int, float)) or total_price <= 0:
+            print(f"Skipping {name}: no usable total_price")
+            continue
+        percent = alpha_percent(tgp_grid, total_price)
+        alpha = percent / 100
+        items = gpu_line_items(rfp.get('t1'), rfp.get('t2'))
+        counts = [adjusted_gpu_count(items[family], alpha) for family in GPU_FAMILIES]
+        counts.append(sum(counts))
+        rfps.append({'name': name, 'rfp_no': str(rfp.get('rfp_no')), 'lead_org': str(rfp.get('lead_org')),
+                     'price': total_price, 'series': [encode_steps(values) for values in counts],
+                     'alpha_steps': encode_steps(np.rint(percent * 10).astype(np.int64))})
+    return rfps
+
+def charts_to_html(rfps, tgps, output_file, assets_dir=None):
+    sweep = {'tgps': list(tgps), 'families': CHART_FAMILIES, 'rfps': rfps}
+    sweep_json = json.dumps(sweep, separators=(',', ':')).replace('</', '<\\/')
+    legend = ''.join(f'<span><i style="background-color: {color}"></i>{label}</span>'
+                     for label, color in [('B200', '#8e44ad'), ('H200', '#2980b9'), ('RTX6000', '#27ae60'),
+                                          ('L40S', '#e67e22'), ('Total', '#2c3e50'), ('alpha (right axis)', '#c0392b')])
+    html_content = page_head('ST1 TGP Sweep', [CHARTS_STYLE], [CHARTS_SCRIPT], output_file, assets_dir) + f"""    <div class="container">
+        <h1>ST1 TGP Sweep</h1>
+        <div class="legend">{legend}</div>
+        <div class="charts" id="charts"></div>
+        <div class="timestamp">Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} &middot; {len(rfps)} RFPs &times; {len(tgps)} TGP values ({tgps[0]} to {tgps[-1]})</div>
+    </div>
+    <script type="application/json" id="sweep-data">{sweep_json}</script>
+    <script>initCharts();</script>
+""" + PAGE_END
+    with open(output_file, 'w', encoding='utf-8') as f:
+        f.write(html_content)
+    return output_file
+
+def main():
+    parser = argparse.ArgumentParser(description='Build a single HTML report of the TGP summaries and the YAML files')
+    parser.add_argument('--tgps', type=float, nargs='+', help='TGP values to report')
+    parser.add_argument('--tgp-range', type=float, nargs=3, metavar=('START', 'STOP', 'STEP'), default=[1.5, 2.1, 0.1],
+                        help='Inclusive TGP range when --tgps is not given (default: 1.5 2.1 0.1)')
+    parser.add_argument('--yaml-files', nargs='+', default=YAML_FILES, help='YAML files to read (default: 1.yaml ... 5.yaml)')
+    parser.add_argument('--charts', action='store_true', help='Write a compact page of per-RFP step charts of the sweep instead of the tables')
+    parser.add_argument('--output', help='Output HTML file (default: report.html, or sweep_charts.html with --charts)')
+    parser.add_argument('--write-csv', action='store_true', help='Also write summary_ST1-<tgp>.csv for each TGP')
+    parser.add_argument('--assets', metavar='DIR', help='Write the CSS/JS to content-hashed files in DIR and link them instead of inlining them')
+    parser.add_argument('--force', action='store_true', help='Regenerate the report even if its inputs and options are unchanged')
+    args = parser.parse_args()
+
+    tgps = args.tgps or tgp_range(*args.tgp_range)
+    output = args.output or ('sweep_charts.html' if args.charts else 'report.html')
+    output_files = [output]
+    if args.write_csv and not args.charts:
+        output_files += [f"summary_ST1-{str(tgp).replace('.', 'p')}.csv" for tgp in tgps]
+    if args.assets:
+        if args.charts:
+            output_files += asset_paths([CHARTS_STYLE], [CHARTS_SCRIPT], args.assets)
+        else:
+            output_files += asset_paths(REPORT_STYLES, REPORT_SCRIPTS, args.assets)
+
+    # Skip the run if the report was built from the same YAML files and options
+    manifest = load_manifest()
+    options = {'tgps': tgps, 'charts': args.charts, 'write_csv': args.write_csv, 'assets': args.assets}
+    build_id = build_key('report', __file__, args.yaml_files, options, manifest)
+    if not args.force and is_up_to_date(manifest, output_files, build_id):
+        print(f"{output} is up to date, skipping (use --force to regenerate)")
+        return
+
+    if args.charts:
+        # Only prices and GPU line items are kept, so the YAML files are streamed
+        # The charts draw steps between consecutive TGP values
+        tgps = sorted(tgps)
+        rfps = sweep_series(iter_yaml_documents(args.yaml_files), tgps)
+        if not rfps:
+            print("Error: no RFPs with a total_price could be read.")
+            sys.exit(1)
+        output_file = charts_to_html(rfps, tgps, output, args.assets)
+    else:
+        # Each YAML file is parsed once and shared by the summaries and the YAML view
+        yaml_data = read_yaml_files(args.yaml_files)
+        if not yaml_data:
+            print("Error: no YAML files could be read.")
+            sys.exit(1)
+        tables = summary_tables(yaml_data, tgps, args.write_csv)
+        output_file = report_to_html(tables, yaml_data, output, args.assets)
+    record_outputs(manifest, output_files, build_id)
+    print(f"HTML file generated: {output_file}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+
+# Local SQLite store of RFP documents, their line items and per-TGP summary
+# rows, so results from earlier evaluation rounds can be queried with SQL
+# instead of re-parsing archived YAML files. Files are keyed by the SHA-256 of
+# their contents; for a file already in the store, its RFPs and line items are
+# not inserted again, and neither are summaries for TGPs it already has.
+
+import json
+import sqlite3
+from datetime import datetime
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    file_hash TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    first_seen TEXT NOT NULL,
+    last_seen TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS rfps (
+    rfp_id INTEGER PRIMARY KEY,
+    file_hash TEXT NOT NULL REFERENCES files(file_hash) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    rfp_no TEXT,
+    lead_org TEXT,
+    total_price REAL,
+    sstack TEXT,
+    document TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS line_items (
+    item_id INTEGER PRIMARY KEY,
+    rfp_id INTEGER NOT NULL REFERENCES rfps(rfp_id) ON DELETE CASCADE,
+    node TEXT NOT NULL,
+    item_label TEXT,
+    item_count,
+    gpu_family TEXT,
+    gpu_count INTEGER,
+    fields TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS summaries (
+    rfp_id INTEGER NOT NULL REFERENCES rfps(rfp_id) ON DELETE CASCADE,
+    tgp REAL NOT NULL,
+    alpha REAL,
+    b_orig INTEGER, b_adj INTEGER,
+    h_orig INTEGER, h_adj INTEGER,
+    r_orig INTEGER, r_adj INTEGER,
+    l_orig INTEGER, l_adj INTEGER,
+    t_orig INTEGER, t_adj INTEGER,
+    PRIMARY KEY (rfp_id, tgp)
+);
+CREATE INDEX IF NOT EXISTS rfps_file_hash ON rfps(file_hash);
+CREATE INDEX IF NOT EXISTS rfps_rfp_no ON rfps(rfp_no);
+CREATE INDEX IF NOT EXISTS rfps_lead_org ON rfps(lead_org);
+CREATE INDEX IF NOT EXISTS line_items_rfp_id ON line_items(rfp_id);
+CREATE INDEX IF NOT EXISTS line_items_gpu_family ON line_items(gpu_family);
+CREATE INDEX IF NOT EXISTS summaries_tgp ON summaries(tgp);
+"""
+
+ITEM_NODES = ['t1', 't2', 'hn', 'cn', 'hs', 'cs', 'sn']
+GPU_FAMILY_PREFIXES = {'B': 'b200_', 'H': 'h200_', 'R': 'rtx6000_', 'L': 'l40s_'}
+
+def open_store(db_file):
+    conn = sqlite3.connect(db_file)
+    conn.execute('PRAGMA foreign_keys = ON')
+    conn.executescript(SCHEMA)
+    return conn
+
+def to_json(data):
+    return json.dumps(data, default=str, sort_keys=True)
+
+def gpu_family(item_label):
+    if isinstance(item_label, str):
+        for family, prefix in GPU_FAMILY_PREFIXES.items():
+            if item_label.startswith(prefix):
+                return family
+    return None
+
+def stored_rfp_ids(conn, file_hash):
+    # rfp_ids of a file already in the store, in document order
+    rows = conn.execute('SELECT rfp_id FROM rfps WHERE file_hash = ? ORDER BY rfp_id', (file_hash,)).fetchall()
+    return [row[0] for row in rows]
+
+def file_is_stored(conn, file_hash):
+    return conn.execute('SELECT 1 FROM files WHERE file_hash = ?', (file_hash,)).fetchone() is not None
+
+def add_file(conn, file_hash, path):
+    now = datetime.now().isoformat(timespec='seconds')
+    conn.execute('INSERT INTO files (file_hash, path, first_seen, last_seen) VALUES (?, ?, ?, ?) '
+                 'ON CONFLICT(file_hash) DO UPDATE SET path = excluded.path, last_seen = excluded.last_seen',
+                 (file_hash, path, now, now))
+
+def add_rfps(conn, file_hash, documents):
+    # Bulk-inserts a batch of (name, document) pairs and their line items;
+    # returns the new rfp_ids in the same order
+    next_id = conn.execute('SELECT COALESCE(MAX(rfp_id), 0) + 1 FROM rfps').fetchone()[0]
+    rfp_rows = []
+    item_rows = []
+    for rfp_id, (name, data) in enumerate(documents, start=next_id):
+        rfp = data.get('rfp', {}) if isinstance(data, dict) else {}
+        total_price = rfp.get('total_price')
+        rfp_rows.append((rfp_id, file_hash, name,
+                         None if rfp.get('rfp_no') is None else str(rfp.get('rfp_no')),
+                         rfp.get('lead_org'),
+                         total_price if isinstance(total_price, (int, float)) else None,
+                         None if rfp.get('sstack') is None else str(rfp.get('sstack')),
+                         to_json(data)))
+        for node in ITEM_NODES:
+            items = rfp.get(node)
+            for item in items if isinstance(items, list) else [items]:
+                if not isinstance(item, dict):
+                    continue
+                item_count = item.get('item_count')
+                gpu_count = item.get('gpu_count')
+                item_rows.append((rfp_id, node, item.get('item_label'),
+                                  item_count if isinstance(item_count, (int, float, str)) else None,
+                                  gpu_family(item.get('item_label')),
+                                  gpu_count if isinstance(gpu_count, int) else None,
+                                  to_json(item)))
+    conn.executemany('INSERT INTO rfps (rfp_id, file_hash, name, rfp_no, lead_org, total_price, sstack, document) '
+                     'VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rfp_rows)
+    conn.executemany('INSERT INTO line_items (rfp_id, node, item_label, item_count, gpu_family, gpu_count, fields) '
+                     'VALUES (?, ?, ?, ?, ?, ?, ?)', item_rows)
+    return [row[0] for row in rfp_rows]
+
+def stored_tgps(conn, rfp_ids):
+    # TGP values that already have a summary row for every one of rfp_ids
+    if not rfp_ids:
+        return set()
+    placeholders = ','.join('?' * len(rfp_ids))
+    rows = conn.execute(f'SELECT tgp FROM summaries WHERE rfp_id IN ({placeholders}) '
+                        f'GROUP BY tgp HAVING COUNT(*) = ?', list(rfp_ids) + [len(rfp_ids)]).fetchall()
+    return {row[0] for row in rows}
+
+def pair_values(value):
+    # "original,adjusted" -> (original, adjusted); a bare count has no adjustment
+    if isinstance(value, str) and ',' in value:
+        original, adjusted = value.split(',')
+        return int(original), int(adjusted)
+    return int(value), 0
+
+def add_summaries(conn, summaries):
+    # summaries is an iterable of (rfp_id, tgp, row), row being a summary row
+    # as produced by read_yamls.summarize_rfp
+    rows = []
+    for rfp_id, tgp, row in summaries:
+        try:
+            alpha = float(row['alpha'].strip('%'))
+        except (AttributeError, ValueError):
+            alpha = None
+        counts = []
+        for col in ['B', 'H', 'R', 'L', 'T']:
+            counts.extend(pair_values(row[col]))
+        rows.append((rfp_id, tgp, alpha, *counts))
+    conn.executemany('INSERT OR REPLACE INTO summaries (rfp_id, tgp, alpha, b_orig, b_adj, h_orig, h_adj, '
+                     'r_orig, r_adj, l_orig, l_adj, t_orig, t_adj) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                     rows)
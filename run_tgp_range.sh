@@ -14,6 +14,22 @@ end_tgp="2p1"
 step="0p1"
 combined_file="summary_ST1-TGP${start_tgp}-${end_tgp}-step${step}.csv"
 
+# Rebuild the combined file only if it is missing or older than any per-TGP file
+# (read_yamls.py leaves unchanged per-TGP files untouched)
+rebuild=0
+[ -f "$combined_file" ] || rebuild=1
+for tgp in 1.5 1.6 1.7 1.8 1.9 2.0 2.1
+do
+    tgp_str=$(echo $tgp | tr '.' 'p')
+    [ "summary_ST1-${tgp_str}.csv" -nt "$combined_file" ] && rebuild=1
+done
+
+echo "All TGP values have been processed."
+if [ $rebuild -eq 0 ]; then
+    echo "Combined file is up to date: $combined_file"
+    exit 0
+fi
+
 # Concatenate all CSV files with blank lines between them
 for tgp in 1.5 1.6 1.7 1.8 1.9 2.0 2.1
 do
@@ -22,5 +38,4 @@ do
     echo ""  # Add blank line
 done > "$combined_file"
 
-echo "All TGP values have been processed."
 echo "Combined file created: $combined_file" 
\ No newline at end of file
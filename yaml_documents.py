@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+
+# Streaming reader of multi-document YAML files shared by read_yamls.py and
+# yaml_to_pp.py (and, through read_yamls.py, report.py). It only needs PyYAML,
+# so the viewers do not pull in pandas to read their input.
+
+import os
+
+import yaml
+
+def document_name(file_name, index):
+    # Name of the index-th (1-based) document of a multi-document file,
+    # e.g. bundle.yaml -> bundle#3.yaml
+    root, ext = os.path.splitext(file_name)
+    return f"{root}#{index}{ext}"
+
+def iter_yaml_documents(yaml_files, strict=False):
+    # Yields (name, document) for every document of every file, parsing one
+    # document at a time with safe_load_all so only the current document (and
+    # the one after it, to know whether the file has several) is in memory.
+    # Single-document files keep their file name; empty documents are skipped.
+    # By default each file read is reported and a file that cannot be read or
+    # parsed is reported and skipped; with strict the error is raised instead.
+    end = object()
+    for file_name in yaml_files:
+        count = 0
+        try:
+            with open(file_name, 'r') as file:
+                documents = yaml.safe_load_all(file)
+                current = next(documents, end)
+                while current is not end:
+                    following = next(documents, end)
+                    count += 1
+                    if current is not None:
+                        multi = count > 1 or following is not end
+                        yield (document_name(file_name, count) if multi else file_name), current
+                    current = following
+            if not strict:
+                print(f"Successfully read {file_name}" + (f" ({count} documents)" if count > 1 else ""))
+        except yaml.YAMLError as e:
+            if strict:
+                raise
+            print(f"YAML error in {file_name}: {e}")
+        except Exception as e:
+            if strict:
+                raise
+            print(f"Error reading {file_name}: {str(e)}")
@@ -2,71 +2,57 @@
 
 import yaml
 import argparse
+import json
+import re
+import shutil
 import sys
 import os
+import tempfile
 from datetime import datetime
 
-def yaml_to_html(data, filename):
-    html_content = f"""<!DOCTYPE html>
-<html>
-<head>
-    <title>YAML Viewer</title>
-    <style>
-        body {{
-            font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, Helvetica, Arial, sans-serif;
-            margin: 20px;
-            background-color: #f5f5f5;
-        }}
-        .container {{
+from build_manifest import load_manifest, build_key, is_up_to_date, record_outputs
+from html_render import page_head, asset_paths, PAGE_END
+from yaml_documents import iter_yaml_documents
+
+STYLE = """        .container {
             max-width: 1200px;
             margin: 0 auto;
             background-color: white;
             padding: 20px;
             border-radius: 8px;
             box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-        }}
-        h1 {{
-            color: #333;
-            border-bottom: 2px solid #eee;
-            padding-bottom: 10px;
-        }}
-        .yaml-content {{
+        }
+        .yaml-content {
             background-color: #f8f9fa;
             padding: 20px;
             border-radius: 4px;
             white-space: pre-wrap;
             font-family: 'SF Mono', 'Menlo', 'Monaco', 'Courier New', monospace;
             line-height: 1.5;
-        }}
-        .key {{
+        }
+        .key {
             color: #2c3e50;
             font-weight: bold;
             cursor: pointer;
-        }}
-        .value {{
+        }
+        .value {
             color: #27ae60;
-        }}
-        .number {{
+        }
+        .number {
             color: #e67e22;
-        }}
-        .null {{
+        }
+        .null {
             color: #95a5a6;
             font-style: italic;
-        }}
-        .timestamp {{
-            color: #7f8c8d;
-            font-size: 0.8em;
-            text-align: right;
-            margin-top: 20px;
-        }}
-        .collapsible {{
+        }
+        .collapsible {
             cursor: pointer;
             user-select: none;
             position: relative;
             padding-left: 15px;
             margin: 2px 0;
-        }}
-        .collapsible::before {{
+        }
+        .collapsible::before {
             content: '+';
             position: absolute;
             left: 0;
@@ -76,26 +62,26 @@ def yaml_to_html(data, filename):
             line-height: 1;
             width: 12px;
             text-align: center;
-        }}
-        .collapsible.collapsed::before {{
+        }
+        .collapsible.collapsed::before {
             content: '+';
-        }}
-        .collapsible:not(.collapsed)::before {{
+        }
+        .collapsible:not(.collapsed)::before {
             content: '-';
-        }}
-        .collapsible-content {{
+        }
+        .collapsible-content {
             margin-left: 15px;
             display: block;
             border-left: 1px solid #ddd;
             padding-left: 10px;
-        }}
-        .collapsible-content.collapsed {{
+        }
+        .collapsible-content.collapsed {
             display: none;
-        }}
-        .controls {{
+        }
+        .controls {
             margin-bottom: 20px;
-        }}
-        .controls button {{
+        }
+        .controls button {
             padding: 8px 16px;
             margin-right: 10px;
             border: none;
@@ -105,164 +91,271 @@ def yaml_to_html(data, filename):
             cursor: pointer;
             transition: background-color 0.2s;
             font-family: inherit;
-        }}
-        .controls button:hover {{
+        }
+        .controls button:hover {
             background-color: #2980b9;
-        }}
-        .list-item {{
+        }
+        .list-item {
             position: relative;
             padding-left: 15px;
             margin: 2px 0;
-        }}
-        .list-item::before {{
+        }
+        .list-item::before {
             content: '-';
             position: absolute;
             left: 0;
             color: #666;
             width: 12px;
             text-align: center;
-        }}
-        .list-container {{
+        }
+        .list-container {
             margin-left: 15px;
             border-left: 1px solid #ddd;
             padding-left: 10px;
-        }}
-        /* Tab styles */
-        .tabs {{
-            display: flex;
-            border-bottom: 1px solid #ddd;
+        }
+        /* Search styles */
+        .search {
             margin-bottom: 20px;
-        }}
-        .tab {{
-            padding: 10px 20px;
+        }
+        .search input {
+            width: 100%;
+            box-sizing: border-box;
+            padding: 8px 12px;
+            border: 1px solid #ddd;
+            border-radius: 4px;
+            font-family: inherit;
+            font-size: 15px;
+        }
+        .search-status {
+            color: #7f8c8d;
+            font-size: 0.9em;
+            margin: 6px 0;
+        }
+        .search-results {
+            max-height: 200px;
+            overflow-y: auto;
+        }
+        .search-result {
+            padding: 2px 4px;
             cursor: pointer;
-            border: 1px solid transparent;
-            border-bottom: none;
-            margin-right: 5px;
-            border-radius: 4px 4px 0 0;
-            background-color: #f8f9fa;
-        }}
-        .tab.active {{
-            background-color: white;
-            border-color: #ddd;
-            border-bottom-color: white;
-            margin-bottom: -1px;
-        }}
-        .tab-content {{
-            display: none;
-        }}
-        .tab-content.active {{
-            display: block;
-        }}
-    </style>
-    <script>
-        function toggleCollapse(element) {{
+            font-family: 'SF Mono', 'Menlo', 'Monaco', 'Courier New', monospace;
+            font-size: 0.9em;
+        }
+        .search-result:hover, .search-result.current {
+            background-color: #eaf2f8;
+        }
+        .search-hit {
+            background-color: #fff3b0;
+        }"""
+
+SCRIPT = """        function toggleCollapse(element) {
             element.classList.toggle('collapsed');
             const content = element.nextElementSibling;
             content.classList.toggle('collapsed');
-        }}
+        }
 
-        function expandAll() {{
+        function expandAll() {
             const activeTab = document.querySelector('.tab-content.active');
-            if (activeTab) {{
-                activeTab.querySelectorAll('.collapsible').forEach(el => {{
+            if (activeTab) {
+                activeTab.querySelectorAll('.collapsible').forEach(el => {
                     el.classList.remove('collapsed');
                     el.nextElementSibling.classList.remove('collapsed');
-                }});
-            }}
-        }}
+                });
+            }
+        }
 
-        function collapseAll() {{
+        function collapseAll() {
             const activeTab = document.querySelector('.tab-content.active');
-            if (activeTab) {{
-                activeTab.querySelectorAll('.collapsible').forEach(el => {{
+            if (activeTab) {
+                activeTab.querySelectorAll('.collapsible').forEach(el => {
                     el.classList.add('collapsed');
                     el.nextElementSibling.classList.add('collapsed');
-                }});
-            }}
-        }}
+                });
+            }
+        }
 
-        function switchTab(tabId) {{
-            // Hide all tab contents
-            document.querySelectorAll('.tab-content').forEach(content => {{
-                content.classList.remove('active');
-            }});
-            // Deactivate all tabs
-            document.querySelectorAll('.tab').forEach(tab => {{
-                tab.classList.remove('active');
-            }});
-            // Activate selected tab and content
-            var tabBtn = document.getElementById('tab-' + tabId);
-            var tabContent = document.getElementById('tab-' + tabId + '-content');
-            if (tabBtn && tabContent) {{
-                tabBtn.classList.add('active');
-                tabContent.classList.add('active');
-            }}
-        }}
-    </script>
-</head>
-<body>
-    <div class="container">
-        <h1>YAML Viewer</h1>
-        <div class="tabs">
-{generate_tabs(data)}
+        // Search over the index embedded by yaml_to_pp.py: tokens map to node ids,
+        // nodes map to [tab index, path]. Token keys are sorted once so prefix
+        // lookups are a binary search instead of a scan of the DOM.
+        var searchIndex = null;
+        var searchTokens = null;
+        var searchMatches = [];
+        var searchPos = -1;
+
+        function loadSearchIndex() {
+            if (!searchIndex) {
+                searchIndex = JSON.parse(document.getElementById('search-index').textContent);
+                searchTokens = Object.keys(searchIndex.tokens).sort();
+            }
+        }
+
+        function lowerBound(arr, value) {
+            var lo = 0, hi = arr.length;
+            while (lo < hi) {
+                var mid = (lo + hi) >> 1;
+                if (arr[mid] < value) lo = mid + 1; else hi = mid;
+            }
+            return lo;
+        }
+
+        function lookupPrefix(prefix) {
+            var ids = new Set();
+            for (var i = lowerBound(searchTokens, prefix); i < searchTokens.length && searchTokens[i].startsWith(prefix); i++) {
+                searchIndex.tokens[searchTokens[i]].forEach(id => ids.add(id));
+            }
+            return ids;
+        }
+
+        function runSearch(query) {
+            loadSearchIndex();
+            var terms = query.toLowerCase().split(/[^\\w.\\-]+/).filter(t => t);
+            var result = null;
+            terms.forEach(term => {
+                var ids = lookupPrefix(term);
+                result = result === null ? ids : new Set([...result].filter(id => ids.has(id)));
+            });
+            searchMatches = result ? Array.from(result).sort((a, b) => a - b) : [];
+            searchPos = -1;
+            renderSearchResults(terms.length > 0);
+        }
+
+        function renderSearchResults(hasQuery) {
+            var status = document.getElementById('search-status');
+            var list = document.getElementById('search-results');
+            list.innerHTML = '';
+            if (!hasQuery) {
+                status.textContent = '';
+                return;
+            }
+            status.textContent = searchMatches.length + ' match' + (searchMatches.length === 1 ? '' : 'es');
+            searchMatches.slice(0, 200).forEach((id, i) => {
+                var node = searchIndex.nodes[id];
+                var row = document.createElement('div');
+                row.className = 'search-result';
+                row.textContent = searchIndex.tabs[node[0]][1] + ': ' + node[1];
+                row.onclick = () => showMatch(i);
+                list.appendChild(row);
+            });
+        }
+
+        function showMatch(pos) {
+            if (!searchMatches.length) return;
+            searchPos = (pos + searchMatches.length) % searchMatches.length;
+            var id = searchMatches[searchPos];
+            switchTab(searchIndex.tabs[searchIndex.nodes[id][0]][0]);
+            var el = document.getElementById('n' + id);
+            if (!el) return;
+            // Expand the node itself and every collapsed ancestor
+            if (el.classList.contains('collapsible')) {
+                el.classList.remove('collapsed');
+                el.nextElementSibling.classList.remove('collapsed');
+            }
+            for (var p = el.parentElement; p; p = p.parentElement) {
+                if (p.classList.contains('collapsible-content')) {
+                    p.classList.remove('collapsed');
+                    p.previousElementSibling.classList.remove('collapsed');
+                }
+            }
+            document.querySelectorAll('.search-hit').forEach(hit => hit.classList.remove('search-hit'));
+            el.classList.add('search-hit');
+            el.scrollIntoView({block: 'center'});
+            document.querySelectorAll('.search-result').forEach((row, i) => {
+                row.classList.toggle('current', i === searchPos);
+            });
+        }
+
+        function searchKeydown(event) {
+            if (event.key === 'Enter') {
+                showMatch(event.shiftKey ? searchPos - 1 : searchPos + 1);
+            }
+        }"""
+
+CONTROLS = """        <div class="search">
+            <input type="search" placeholder="Search keys and values across all files (Enter for next match)" oninput="runSearch(this.value)" onkeydown="searchKeydown(event)">
+            <div class="search-status" id="search-status"></div>
+            <div class="search-results" id="search-results"></div>
         </div>
         <div class="controls">
             <button onclick="expandAll()">Expand All</button>
             <button onclick="collapseAll()">Collapse All</button>
+        </div>"""
+
+def yaml_to_html(documents, output_file="browse_yamls.html", assets_dir=None):
+    # documents is an iterable of (name, data) pairs; each document is rendered
+    # and released before the next is read. The tab bar comes before the tab
+    # contents in the page but is only known at the end, so the contents are
+    # spooled to a temporary file and copied in after it.
+    search_index = new_search_index()
+    names = []
+    with tempfile.TemporaryFile('w+', encoding='utf-8') as spool:
+        for i, (name, yaml_data) in enumerate(documents):
+            spool.write(generate_tab_content(i, name, yaml_data, search_index) + '\n')
+            names.append(name)
+        spool.seek(0)
+        with open(output_file, 'w', encoding='utf-8') as f:
+            f.write(page_head('YAML Viewer', [STYLE], [SCRIPT], output_file, assets_dir) + f"""    <div class="container">
+        <h1>YAML Viewer</h1>
+        <div class="tabs">
+{generate_tabs(dict.fromkeys(names))}
         </div>
-{generate_tab_contents(data)}
-        <div class="timestamp">Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</div>
+{CONTROLS}
+""")
+            shutil.copyfileobj(spool, f)
+            f.write(f"""        <div class="timestamp">Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</div>
     </div>
-</body>
-</html>"""
-    
-    output_file = "browse_yamls.html"
-    with open(output_file, 'w') as f:
-        f.write(html_content)
+    <script type="application/json" id="search-index">{search_index_json(search_index)}</script>
+""" + PAGE_END)
     return output_file
 
-def generate_tabs(data):
+def generate_tabs(data, first_active=True):
     tabs = []
     for i, (filename, _) in enumerate(data.items()):
         tab_id = os.path.splitext(os.path.basename(filename))[0].replace('.', '_')
-        active_class = ' active' if i == 0 else ''
+        active_class = ' active' if first_active and i == 0 else ''
         tabs.append(f'            <div class="tab{active_class}" id="tab-{tab_id}" onclick="switchTab(\'{tab_id}\')">{os.path.basename(filename)}</div>')
     return '\n'.join(tabs)
 
-def generate_tab_contents(data):
+def generate_tab_contents(data, search_index=None, first_active=True):
     contents = []
     for i, (filename, yaml_data) in enumerate(data.items()):
-        tab_id = os.path.splitext(os.path.basename(filename))[0].replace('.', '_')
-        active_class = ' active' if i == 0 else ''
-        content = f"""        <div id="tab-{tab_id}-content" class="tab-content{active_class}">
+        contents.append(generate_tab_content(i, filename, yaml_data, search_index, first_active))
+    return '\n'.join(contents)
+
+def generate_tab_content(i, filename, yaml_data, search_index=None, first_active=True):
+    tab_id = os.path.splitext(os.path.basename(filename))[0].replace('.', '_')
+    active_class = ' active' if first_active and i == 0 else ''
+    if search_index is not None:
+        search_index['tabs'].append([tab_id, os.path.basename(filename)])
+    return f"""        <div id="tab-{tab_id}-content" class="tab-content{active_class}">
             <div class="yaml-content">
-{format_yaml_for_html(yaml_data, top_level=True)}
+{format_yaml_for_html(yaml_data, top_level=True, search_index=search_index)}
             </div>
         </div>"""
-        contents.append(content)
-    return '\n'.join(contents)
 
-def format_yaml_for_html(data, indent=0, top_level=False):
+def format_yaml_for_html(data, indent=0, top_level=False, path='', search_index=None):
     if isinstance(data, dict):
         items = []
         for k, v in data.items():
+            child_path = f"{path}.{k}" if path else str(k)
+            node_attr = node_id_attr(search_index, child_path, k, v)
             if isinstance(v, (dict, list)):
                 collapsed_class = '' if top_level else ' collapsed'
-                items.append(f"{'  ' * indent}<div class='collapsible{collapsed_class}' onclick='toggleCollapse(this)'><span class='key'>{k}:</span></div>")
-                items.append(f"{'  ' * indent}<div class='collapsible-content{collapsed_class}'>{format_yaml_for_html(v, indent + 1, top_level=False)}</div>")
+                items.append(f"{'  ' * indent}<div class='collapsible{collapsed_class}'{node_attr} onclick='toggleCollapse(this)'><span class='key'>{k}:</span></div>")
+                items.append(f"{'  ' * indent}<div class='collapsible-content{collapsed_class}'>{format_yaml_for_html(v, indent + 1, False, child_path, search_index)}</div>")
             else:
-                items.append(f"{'  ' * indent}<span class='key'>{k}:</span> {format_yaml_for_html(v, indent + 1, top_level=False)}")
+                items.append(f"{'  ' * indent}<span class='key'{node_attr}>{k}:</span> {format_yaml_for_html(v, indent + 1, False, child_path, search_index)}")
         return '\n'.join(items)
     elif isinstance(data, list):
         items = []
-        for item in data:
+        for i, item in enumerate(data):
+            child_path = f"{path}[{i}]"
+            node_attr = node_id_attr(search_index, child_path, None, item)
             if isinstance(item, (dict, list)):
                 collapsed_class = '' if top_level else ' collapsed'
-                items.append(f"{'  ' * indent}<div class='collapsible{collapsed_class}' onclick='toggleCollapse(this)'><span class='list-item'></span></div>")
-                items.append(f"{'  ' * indent}<div class='collapsible-content list-container{collapsed_class}'>{format_yaml_for_html(item, indent + 1, top_level=False)}</div>")
+                items.append(f"{'  ' * indent}<div class='collapsible{collapsed_class}'{node_attr} onclick='toggleCollapse(this)'><span class='list-item'></span></div>")
+                items.append(f"{'  ' * indent}<div class='collapsible-content list-container{collapsed_class}'>{format_yaml_for_html(item, indent + 1, False, child_path, search_index)}</div>")
             else:
-                items.append(f"{'  ' * indent}<span class='list-item'></span> {format_yaml_for_html(item, indent + 1, top_level=False)}")
+                items.append(f"{'  ' * indent}<span class='list-item'{node_attr}></span> {format_yaml_for_html(item, indent + 1, False, child_path, search_index)}")
         return '\n'.join(items)
     elif data is None:
         return "<span class='null'>null</span>"
@@ -271,13 +364,50 @@ def format_yaml_for_html(data, indent=0, top_level=False):
     else:
         return f"<span class='value'>{str(data)}</span>"
 
-def pretty_print_yaml(yaml_files):
+def new_search_index():
+    # tabs: [tab_id, label] per file; nodes: [tab index, key path] per node;
+    # tokens: token -> list of node ids (node ids are also the element ids 'n<id>')
+    return {'tabs': [], 'nodes': [], 'tokens': {}}
+
+def tokenize(text):
+    # Keep compound labels such as 'b200_8way' or 'xeon-8570' whole and also index
+    # their parts, so searching for 'b200' or '8570' finds them
+    tokens = set()
+    for word in re.findall(r'[\w.\-]+', str(text).lower()):
+        word = word.strip('.-')
+        if word:
+            tokens.add(word)
+            tokens.update(part for part in re.split(r'[_.\-]+', word) if part)
+    return tokens
+
+def node_id_attr(search_index, path, key, value):
+    if search_index is None:
+        return ''
+    node_id = len(search_index['nodes'])
+    search_index['nodes'].append([len(search_index['tabs']) - 1, path])
+    tokens = tokenize(key) if key is not None else set()
+    if not isinstance(value, (dict, list)) and value is not None:
+        tokens |= tokenize(value)
+    for token in sorted(tokens):
+        search_index['tokens'].setdefault(token, []).append(node_id)
+    return f" id='n{node_id}'"
+
+def search_index_json(search_index):
+    # Compact separators keep the embedded index small; escape '</' so a value
+    # can never close the surrounding <script> element
+    return json.dumps(search_index, separators=(',', ':'), ensure_ascii=False).replace('</', '<\\/')
+
+def pretty_print_yaml(yaml_files, force=False, assets_dir=None):
+    # Skip the run if the page was built from the same YAML files
+    output_files = ["browse_yamls.html"] + (asset_paths([STYLE], [SCRIPT], assets_dir) if assets_dir else [])
+    manifest = load_manifest()
+    build_id = build_key('yaml_to_pp', __file__, yaml_files, {'assets': assets_dir}, manifest)
+    if not force and is_up_to_date(manifest, output_files, build_id):
+        print("browse_yamls.html is up to date, skipping (use --force to regenerate)")
+        return
     try:
-        data = {}
-        for yaml_file in yaml_files:
-            with open(yaml_file, 'r') as file:
-                data[yaml_file] = yaml.safe_load(file)
-        output_file = yaml_to_html(data, yaml_files[0])
+        output_file = yaml_to_html(iter_yaml_documents(yaml_files, strict=True), output_files[0], assets_dir)
+        record_outputs(manifest, output_files, build_id)
         print(f"HTML file generated: {output_file}")
     except FileNotFoundError as e:
         print(f"Error: File not found: {e}")
@@ -289,9 +419,11 @@ def pretty_print_yaml(yaml_files):
 def main():
     parser = argparse.ArgumentParser(description='Convert YAML files to formatted HTML')
     parser.add_argument('yaml_files', nargs='+', help='Path(s) to the YAML file(s) to convert')
+    parser.add_argument('--assets', metavar='DIR', help='Write the CSS/JS to content-hashed files in DIR and link them instead of inlining them')
+    parser.add_argument('--force', action='store_true', help='Regenerate the HTML even if the YAML files are unchanged')
     args = parser.parse_args()
 
-    pretty_print_yaml(args.yaml_files)
+    pretty_print_yaml(args.yaml_files, args.force, args.assets)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file